@@ -0,0 +1,158 @@
+"""
+Text exports of a parsed Brewin program: Graphviz DOT, JSON and S-expressions.
+
+Unlike plot.py these only need the standard library, and they write to the output
+as they walk the tree (with an explicit stack, so deep expressions are fine), which
+makes them cheap enough to dump ASTs for thousands of programs at once:
+
+    python astdump.py --format dot -o out/ v4/tests/*.br
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from element import Element
+
+
+class Raw(str):
+    """Output text that is written as is rather than encoded as a value"""
+
+
+def json_chunks(ast):
+    stack = [ast]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, Raw):
+            yield item
+        elif isinstance(item, Element):
+            parts = [Raw('{"elem_type": ' + json.dumps(item.elem_type))]
+            for key, value in item.dict.items():
+                parts += [Raw(", " + json.dumps(key) + ": "), value]
+            parts.append(Raw("}"))
+            stack.extend(reversed(parts))
+        elif isinstance(item, list):
+            parts = [Raw("[")]
+            for i, value in enumerate(item):
+                parts += [Raw(", "), value] if i else [value]
+            parts.append(Raw("]"))
+            stack.extend(reversed(parts))
+        else:
+            yield json.dumps(item)
+
+
+def sexpr_atom(value):
+    if value is None:
+        return "nil"
+    if isinstance(value, bool):
+        return "#t" if value else "#f"
+    if isinstance(value, str):
+        return json.dumps(value)  # double quoted, with the usual escapes
+    return str(value)
+
+
+def sexpr_chunks(ast):
+    stack = [ast]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, Raw):
+            yield item
+        elif isinstance(item, Element):
+            parts = [Raw("(" + item.elem_type)]
+            for key, value in item.dict.items():
+                parts += [Raw(" :" + key + " "), value]
+            parts.append(Raw(")"))
+            stack.extend(reversed(parts))
+        elif isinstance(item, list):
+            parts = [Raw("(")]
+            for i, value in enumerate(item):
+                parts += [Raw(" "), value] if i else [value]
+            parts.append(Raw(")"))
+            stack.extend(reversed(parts))
+        else:
+            yield sexpr_atom(item)
+
+
+def dot_label(node):
+    lines = [node.elem_type]
+    for key, value in node.dict.items():
+        if not isinstance(value, (Element, list)):
+            lines.append(f"{key}={value}")
+    return json.dumps("\n".join(lines), ensure_ascii=False)  # a valid DOT quoted string as well
+
+
+def dot_chunks(ast):
+    yield "digraph ast {\n  node [shape=box];\n"
+    stack = [(ast, 0)]
+    next_id = 1
+    while stack:
+        node, node_id = stack.pop()
+        yield f"  n{node_id} [label={dot_label(node)}];\n"
+        children = []
+        for key, value in node.dict.items():
+            if isinstance(value, Element):
+                children.append((key, value))
+            elif isinstance(value, list):
+                children += [(f"{key}[{i}]", c) for i, c in enumerate(value) if isinstance(c, Element)]
+        for key, child in children:
+            yield f"  n{node_id} -> n{next_id} [label={json.dumps(key)}];\n"
+            stack.append((child, next_id))
+            next_id += 1
+    yield "}\n"
+
+
+FORMATS = {
+    "dot": (dot_chunks, ".dot"),
+    "json": (json_chunks, ".json"),
+    "sexpr": (sexpr_chunks, ".sexpr"),
+}
+
+
+# exported functions
+def write_ast(ast, out, fmt="json"):
+    """Stream ast to out (a path or writable text file) in one of FORMATS"""
+    chunks, _ = FORMATS[fmt]
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, "w", encoding="utf-8") as handle:
+            write_ast(ast, handle, fmt)
+        return
+    for chunk in chunks(ast):
+        out.write(chunk)
+    if fmt != "dot":
+        out.write("\n")
+
+
+def write_dot(ast, out):
+    write_ast(ast, out, "dot")
+
+
+def write_json(ast, out):
+    write_ast(ast, out, "json")
+
+
+def write_sexpr(ast, out):
+    write_ast(ast, out, "sexpr")
+
+
+def main():
+    from brewparse import parse_program_file
+
+    arg_parser = argparse.ArgumentParser(description="Dump Brewin ASTs as DOT, JSON or S-expressions")
+    arg_parser.add_argument("files", nargs="+", help="Brewin source files")
+    arg_parser.add_argument("--format", choices=FORMATS, default="json")
+    arg_parser.add_argument("-o", "--outdir", help="write <name><ext> per file here instead of stdout")
+    args = arg_parser.parse_args()
+
+    for filename in args.files:
+        ast = parse_program_file(filename)
+        if args.outdir is None:
+            write_ast(ast, sys.stdout, args.format)
+            continue
+        os.makedirs(args.outdir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(filename))[0] + FORMATS[args.format][1]
+        write_ast(ast, os.path.join(args.outdir, name), args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Compact binary form of a parsed Brewin program, so a program can be parsed once
+and then loaded and run many times without re-parsing.
+
+Layout (all little endian):
+    header      magic, string/node/field/item counts, root node index
+    strings     (count + 1) u32 offsets into the string blob
+    nodes       per node: elem_type string id, first field, field count (3 x u32)
+    fields      per field: key string id, tag, value (u32, u32, i64)
+    items       per list: a header record holding the entry count in its key
+                slot, then one record per entry (same layout as a field)
+    blob        utf-8 text of every interned string
+
+A loaded program is backed by an mmap; nodes are only decoded when they are
+reached, and every string (names, node types, literals) is decoded at most once.
+The mapping stays open until the program is closed, so use open_packed() as a
+context manager (or call close() on element.program) once the tree is done with.
+"""
+
+import mmap
+import os
+import struct
+import sys
+
+from element import Element
+
+MAGIC = b"BRAST2\x00\x00"
+HEADER = struct.Struct("<8sIIIII")
+OFFSET = struct.Struct("<I")
+NODE = struct.Struct("<III")
+FIELD = struct.Struct("<IIq")
+
+# value tags
+NONE = 0
+BOOL = 1
+INT = 2
+STRING = 3
+NODE_REF = 4
+LIST = 5
+BIG_INT = 6  # ints outside of the i64 range are stored as their decimal string
+
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+
+
+class PackedElement(Element):
+    """Element whose fields are decoded from the packed buffer on first access"""
+
+    def __init__(self, program, index):
+        self.program = program
+        self.index = index
+        type_id, self.first_field, self.field_count = program.node(index)
+        self.elem_type = program.string(type_id)
+        self.fields = None
+
+    @property
+    def dict(self):
+        if self.fields is None:
+            self.fields = self.program.decode_fields(self.first_field, self.field_count)
+        return self.fields
+
+
+class PackedProgram:
+    """Read side of the format; owns the buffer the nodes are decoded from"""
+
+    def __init__(self, buf, mapping=None):
+        self.mapping = mapping
+        self.buf = memoryview(buf)
+        if len(self.buf) < HEADER.size:
+            self.close()
+            raise ValueError("not a packed Brewin program")
+        magic, n_strings, n_nodes, n_fields, n_items, self.root = HEADER.unpack_from(
+            self.buf, 0
+        )
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("not a packed Brewin program")
+
+        self.offsets_at = HEADER.size
+        self.nodes_at = self.offsets_at + (n_strings + 1) * OFFSET.size
+        self.fields_at = self.nodes_at + n_nodes * NODE.size
+        self.items_at = self.fields_at + n_fields * FIELD.size
+        self.blob_at = self.items_at + n_items * FIELD.size
+
+        self.strings = [None] * n_strings
+        self.elements = {}
+
+    def close(self):
+        """Releases the buffer (and the mmap behind it, if any); undecoded nodes become unreadable"""
+        self.buf.release()
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, sid):
+        s = self.strings[sid]
+        if s is None:
+            start, end = struct.unpack_from("<II", self.buf, self.offsets_at + sid * OFFSET.size)
+            s = str(self.buf[self.blob_at + start : self.blob_at + end], "utf-8")
+            self.strings[sid] = s
+        return s
+
+    def node(self, index):
+        return NODE.unpack_from(self.buf, self.nodes_at + index * NODE.size)
+
+    def element(self, index):
+        elem = self.elements.get(index)
+        if elem is None:
+            elem = self.elements[index] = PackedElement(self, index)
+        return elem
+
+    def root_element(self):
+        return self.element(self.root)
+
+    def decode_fields(self, first, count):
+        fields = {}
+        for i in range(first, first + count):
+            key, tag, value = FIELD.unpack_from(self.buf, self.fields_at + i * FIELD.size)
+            fields[self.string(key)] = self.decode_value(tag, value)
+        return fields
+
+    def decode_value(self, tag, value):
+        if tag == NODE_REF:
+            return self.element(value)
+        if tag == STRING:
+            return self.string(value)
+        if tag == INT:
+            return value
+        if tag == BOOL:
+            return bool(value)
+        if tag == LIST:
+            count, _, _ = FIELD.unpack_from(self.buf, self.items_at + value * FIELD.size)
+            items = []
+            for i in range(value + 1, value + 1 + count):
+                _, item_tag, item_value = FIELD.unpack_from(
+                    self.buf, self.items_at + i * FIELD.size
+                )
+                items.append(self.decode_value(item_tag, item_value))
+            return items
+        if tag == BIG_INT:
+            return int(self.string(value))
+        return None
+
+
+class Packer:
+    """Write side of the format: flattens an Element tree breadth first"""
+
+    def __init__(self):
+        self.string_ids = {}
+        self.nodes = []
+        self.fields = []
+        self.items = []
+        self.pending = []
+
+    def intern(self, s):
+        sid = self.string_ids.get(s)
+        if sid is None:
+            sid = self.string_ids[s] = len(self.string_ids)
+        return sid
+
+    def add_node(self, elem):
+        self.pending.append(elem)
+        return len(self.pending) - 1
+
+    def encode_value(self, value):
+        if isinstance(value, Element):
+            return NODE_REF, self.add_node(value)
+        if isinstance(value, bool):
+            return BOOL, int(value)
+        if isinstance(value, int):
+            if INT64_MIN <= value <= INT64_MAX:
+                return INT, value
+            return BIG_INT, self.intern(str(value))
+        if isinstance(value, str):
+            return STRING, self.intern(value)
+        if isinstance(value, list):
+            header = len(self.items)
+            self.items.append((len(value), NONE, 0))
+            self.items.extend([None] * len(value))  # reserve the slots up front
+            for i, item in enumerate(value):
+                tag, v = self.encode_value(item)
+                self.items[header + 1 + i] = (0, tag, v)
+            return LIST, header
+        if value is None:
+            return NONE, 0
+        raise TypeError(f"cannot pack value of type {type(value).__name__}")
+
+    def pack(self, ast):
+        self.add_node(ast)
+        index = 0
+        while index < len(self.pending):  # pending grows as children are found
+            elem = self.pending[index]
+            first = len(self.fields)
+            for key, value in elem.dict.items():
+                self.fields.append((self.intern(key),) + self.encode_value(value))
+            self.nodes.append((self.intern(elem.elem_type), first, len(self.fields) - first))
+            index += 1
+
+        encoded = [s.encode("utf-8") for s in self.string_ids]
+        out = bytearray(
+            HEADER.pack(
+                MAGIC, len(encoded), len(self.nodes), len(self.fields), len(self.items), 0
+            )
+        )
+        offset = 0
+        out += OFFSET.pack(0)
+        for s in encoded:
+            offset += len(s)
+            out += OFFSET.pack(offset)
+        for record in self.nodes:
+            out += NODE.pack(*record)
+        for record in self.fields:
+            out += FIELD.pack(*record)
+        for record in self.items:
+            out += FIELD.pack(*record)
+        for s in encoded:
+            out += s
+        return bytes(out)
+
+
+# exported functions
+def dumps(ast):
+    return Packer().pack(ast)
+
+
+def dump(ast, dest):
+    data = dumps(ast)
+    if isinstance(dest, (str, os.PathLike)):
+        with open(dest, "wb") as handle:
+            handle.write(data)
+    else:
+        dest.write(data)
+
+
+def loads(data):
+    return PackedProgram(data).root_element()
+
+
+def open_packed(source):
+    """Maps a packed program file; the returned PackedProgram closes the mapping on exit"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as handle:
+            return open_packed(handle)
+    if os.fstat(source.fileno()).st_size == 0:  # mmap refuses empty files
+        raise ValueError("not a packed Brewin program")
+    mapping = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    return PackedProgram(mapping, mapping)
+
+
+def load(source):
+    """Maps a packed program file and returns its (lazily decoded) program node;
+    call node.program.close() to unmap it"""
+    return open_packed(source).root_element()
+
+
+def main():
+    from brewparse import parse_program_file
+
+    if len(sys.argv) != 3:
+        print("usage: python astpack.py <program.br> <program.brast>")
+        sys.exit(1)
+    dump(parse_program_file(sys.argv[1]), sys.argv[2])
+
+
+if __name__ == "__main__":
+    main()
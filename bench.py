@@ -0,0 +1,244 @@
+"""
+Micro benchmarks for interpreter optimizations. Each benchmark runs one Brewin
+program under a baseline and a candidate interpreter configuration, checks
+that both print the same output, and reports the best of a few timed runs.
+Benchmarks without a candidate time changes that can't be switched off; they
+just report the baseline, to compare across commits:
+
+    python bench.py                 # every benchmark
+    python bench.py short_circuit   # just the named ones
+
+MICRO_BENCHMARKS time a Python function instead of a Brewin program, for changes
+below the level of whole programs (such as the layout of Value itself).
+"""
+
+import enum
+import sys
+import time
+
+from brewin import get_interpreter
+from brewin.core import OPERATOR_TABLE, Type, Value
+from brewparse import parse_program
+
+# && guard whose right operand (a call that loops) is only needed for one i in ten
+GUARD_LOOP = """
+def slowb(ni) {
+  var ki;
+  ki = 0;
+  while (ki < 20) {
+    ki = ki + 1;
+  }
+  return ni > ki;
+}
+
+def main() {
+  var i;
+  var counti;
+  i = 0;
+  counti = 0;
+  while (i < 3000) {
+    if (i / 10 * 10 == i && slowb(i)) {
+      counti = counti + 1;
+    }
+    if (i < 100 || slowb(i)) {
+      counti = counti + 1;
+    }
+    i = i + 1;
+  }
+  print(counti);
+}
+"""
+
+# tight counting loop; all of its names are bound before the loop starts
+COUNT_LOOP = """
+def stepi(ni) {
+  return ni + 1;
+}
+
+def main() {
+  var i;
+  var totali;
+  var limiti;
+  i = 0;
+  totali = 0;
+  limiti = 20000;
+  while (i < limiti) {
+    bvar doubledi;
+    doubledi = i * 2;
+    totali = totali + doubledi;
+    i = stepi(i);
+  }
+  print(totali);
+}
+"""
+
+# v2's recursive catalan numbers in v4 syntax: exponential without memoization
+CATALAN = """
+def catalani(ni) {
+  var ansi;
+  var ji;
+  if (ni < 2) {
+    return 1;
+  }
+  ji = 0;
+  while (ji < ni) {
+    ansi = ansi + catalani(ji) * catalani(ni - ji - 1);
+    ji = ji + 1;
+  }
+  return ansi;
+}
+
+def main() {
+  print(catalani(9));
+}
+"""
+
+# recursion that passes two & parameters on down every level (v3); 8191 calls
+REF_RECURSION = """
+def walkv(di, &counti, &sumi) {
+  if (di == 0) {
+    counti = counti + 1;
+    return;
+  }
+  sumi = sumi + di;
+  walkv(di - 1, counti, sumi);
+  walkv(di - 1, counti, sumi);
+}
+
+def main() {
+  var counti;
+  var sumi;
+  walkv(12, counti, sumi);
+  print(counti, " ", sumi);
+}
+"""
+
+# name -> (program, version, baseline options, candidate options or None); options
+# are Interpreter arguments, apart from backend, which is passed to run()
+BENCHMARKS = {
+    "short_circuit": (GUARD_LOOP, 4, {}, {"short_circuit": True}),
+    "loop_hoisting": (COUNT_LOOP, 4, {"hoist_loops": False}, {}),
+    "memoize": (CATALAN, 4, {}, {"memoize": True}),
+    "python_backend": (CATALAN, 4, {}, {"backend": "python"}),
+    "v3_ref_recursion": (REF_RECURSION, 3, {}, None),
+}
+
+
+class EnumType(enum.Enum):
+    # the type tags as they were before Type became plain ints
+    NIL = Type.NIL
+    INT = Type.INT
+    STRING = Type.STRING
+    BOOL = Type.BOOL
+    OBJECT = Type.OBJECT
+    VOID = Type.VOID
+    ERROR = Type.ERROR
+    FUNCTION = Type.FUNCTION
+    INTERFACE = Type.INTERFACE
+    LIST = Type.LIST
+    MAP = Type.MAP
+
+
+ENUM_DEFAULTS = {EnumType.NIL: None, EnumType.INT: 0, EnumType.STRING: "", EnumType.BOOL: False}
+
+
+class DictValue:
+    # Value as it was before it got __slots__, with an enum tag: the value_churn baseline
+    def __init__(self, t=None, v=None):
+        if t is None:
+            t = EnumType.NIL
+        elif t == EnumType.INTERFACE:
+            t = EnumType.OBJECT
+        if v is None:
+            if t not in ENUM_DEFAULTS:
+                raise Exception("invalid default value for type")
+            v = ENUM_DEFAULTS[t]
+        self.t = t
+        self.v = v
+
+    def set(self, other):
+        self.t = other.t
+        self.v = other.v
+
+
+def value_churn(value_class, types, add_table, count=100000):
+    # what evaluating a binary node does to values: make operands and a default
+    # value, update a cell in place and look the operator up by operand types
+    a = value_class(types.INT, 1)
+    for i in range(count):
+        b = value_class(types.INT, i)
+        value_class(types.BOOL)
+        a.set(b)
+        add_table[a.t, b.t]
+    return a.v
+
+
+ENUM_ADD = {(EnumType(l), EnumType(r)): impl for (l, r), impl in OPERATOR_TABLE["+"].items()}
+
+# name -> (baseline function, candidate function); both must return the same result
+MICRO_BENCHMARKS = {
+    "value_churn": (
+        lambda: value_churn(DictValue, EnumType, ENUM_ADD),
+        lambda: value_churn(Value, Type, OPERATOR_TABLE["+"]),
+    ),
+}
+
+
+def time_function(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def time_program(ast, version, options, repeat):
+    interpreter_class = get_interpreter(version)
+    options = dict(options)
+    run_options = {"backend": options.pop("backend")} if "backend" in options else {}
+    best, output = None, None
+    for _ in range(repeat):
+        interpreter = interpreter_class(console_output=False, **options)
+        start = time.perf_counter()
+        interpreter.run(ast, **run_options)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        output = interpreter.get_output()
+    return best, output
+
+
+def run_benchmark(name, repeat=3):
+    if name in MICRO_BENCHMARKS:
+        baseline, candidate = MICRO_BENCHMARKS[name]
+        base_time, base_output = time_function(baseline, repeat)
+        new_time, new_output = time_function(candidate, repeat)
+    else:
+        program, version, baseline, candidate = BENCHMARKS[name]
+        ast = parse_program(program)
+        base_time, base_output = time_program(ast, version, baseline, repeat)
+        if candidate is None:
+            print(f"{name}: {base_time * 1000:.1f} ms")
+            return
+        new_time, new_output = time_program(ast, version, candidate, repeat)
+    if base_output != new_output:
+        raise AssertionError(f"{name}: output changed from {base_output} to {new_output}")
+    print(
+        f"{name}: baseline {base_time * 1000:.1f} ms, candidate {new_time * 1000:.1f} ms, "
+        f"speedup {base_time / new_time:.2f}x"
+    )
+
+
+def main():
+    known = [*BENCHMARKS, *MICRO_BENCHMARKS]
+    names = sys.argv[1:] or known
+    for name in names:
+        if name not in known:
+            print(f"unknown benchmark {name}; expect one of {', '.join(known)}")
+            sys.exit(1)
+        run_benchmark(name)
+
+
+if __name__ == "__main__":
+    main()
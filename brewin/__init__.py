@@ -0,0 +1,29 @@
+"""
+Entry point for running Brewin programs under any language version.
+
+Each version's interpreter still lives in its top-level interpretervN.py (that is
+what the tester and the autograder import); the typed versions share their value
+model, environment, operators and conversions through brewin.core, and
+brewin.features holds the few semantic switches that shared code depends on.
+"""
+
+import importlib
+
+from brewin.features import Features, FEATURES
+
+LATEST_VERSION = max(FEATURES)
+
+
+def get_interpreter(version=LATEST_VERSION):
+    """Returns the Interpreter class for a language version"""
+    version = int(version)
+    if version not in FEATURES:
+        raise ValueError(f"Unsupported version; expect one of {set(FEATURES)}")
+    return importlib.import_module(f"interpreterv{version}").Interpreter
+
+
+def run(program, version=LATEST_VERSION, **kwargs):
+    """Runs program under the given version; returns the interpreter for its output"""
+    interpreter = get_interpreter(version)(**kwargs)
+    interpreter.run(program)
+    return interpreter
@@ -0,0 +1,215 @@
+"""
+Builtin functions implemented in Python. Like any Brewin function, a builtin's
+name ends in its return type letter, and it is picked by name plus argument
+type signature (e.g. ("substrs", "sii")). User defined functions and variables
+of the same name take precedence. Builtins get and return plain Python values:
+an int, a str, a bool, a ListValue or a MapValue per the signature and the
+name's suffix.
+"""
+
+import math
+
+from intbase import ErrorType
+from brewin.core import ListValue, Type
+
+ELEMENT_PARAMS = {"i": Type.INT, "s": Type.STRING, "b": Type.BOOL}
+KEY_PARAMS = {"i": Type.INT, "s": Type.STRING}
+PARAM_TYPES = {**ELEMENT_PARAMS, "l": Type.LIST, "m": Type.MAP}
+RESULT_TYPES = {Type.INT: int, Type.STRING: str, Type.BOOL: bool, Type.LIST: ListValue}
+
+
+class BuiltinError(Exception):
+    """Raised by a builtin to report a Brewin error (an ErrorType) to the program"""
+
+    def __init__(self, error_type, message):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+class Builtin:
+    def __init__(self, name, params, func, pure=False):
+        self.name = name
+        self.params = params  # signature letters, e.g. "sii"
+        self.func = func
+        self.pure = pure  # no side effects, result depends only on the arguments
+        self.return_type = Type.get_type(name)
+        if self.return_type not in RESULT_TYPES and self.return_type != Type.VOID:
+            raise ValueError(f"builtin {name} must end in i, s, b, l or v")
+        if any(p not in PARAM_TYPES for p in params):
+            raise ValueError(f"builtin {name} parameters must be i, s, b, l or m; got {params!r}")
+
+    def call(self, args):
+        """Runs the builtin on raw argument values; returns its raw result"""
+        result = self.func(*args)
+        if self.return_type == Type.VOID:
+            return None
+        expected = RESULT_TYPES[self.return_type]
+        if type(result) is not expected:
+            raise TypeError(
+                f"builtin {self.name} returned {type(result).__name__}, expected {expected.__name__}"
+            )
+        return result
+
+
+def fault(message):
+    raise BuiltinError(ErrorType.FAULT_ERROR, message)
+
+
+def substr(s, start, end):
+    if not 0 <= start <= end <= len(s):
+        fault(f"substring [{start}, {end}) out of range")
+    return s[start:end]
+
+
+def repeat(s, count):
+    if count < 0:
+        fault("negative repeat count")
+    return s * count
+
+
+def power(base, exponent):
+    if exponent < 0:
+        fault("negative exponent")
+    return base**exponent
+
+
+def modulo(a, b):
+    if b == 0:
+        fault("modulo by zero")
+    return a % b
+
+
+def sqrt(n):
+    if n < 0:
+        fault("square root of a negative number")
+    return math.isqrt(n)
+
+
+def char(code):
+    if not 0 <= code <= 0x10FFFF:
+        fault("character code out of range")
+    return chr(code)
+
+
+def ordinal(s):
+    if len(s) != 1:
+        fault("ordi expects a one character string")
+    return ord(s)
+
+
+# lists; an index or range outside the list is a fault, like one in an index expression
+
+def list_slice(items, start, end):
+    if not 0 <= start <= end <= len(items):
+        fault(f"slice [{start}, {end}) out of range")
+    return items.slice(start, end)
+
+
+def list_make(elem_type):
+    def make(count, item):
+        if count < 0:
+            fault("negative list length")
+        result = ListValue(elem_type, [item])
+        result.items *= count
+        return result
+
+    return make
+
+
+def list_update(elem_type, update):
+    # update(items, item) for an item of elem_type; an untyped empty list takes its type
+    def checked(items, item):
+        if not items.adopt(elem_type):
+            raise BuiltinError(ErrorType.TYPE_ERROR, "list element type mismatch")
+        update(items, item)
+
+    return checked
+
+
+def list_builtins():
+    builtins = [("leni", "l", len), ("slicel", "lii", list_slice)]
+    for letter, elem_type in ELEMENT_PARAMS.items():
+        builtins += [
+            ("makel", "i" + letter, list_make(elem_type)),
+            ("appendv", "l" + letter, list_update(elem_type, ListValue.append)),
+            ("fillv", "l" + letter, list_update(elem_type, ListValue.fill)),
+        ]
+    return builtins
+
+
+# maps; getX(map, key, default) is the value for key, or default when key isn't there
+
+def map_contains(key_type):
+    def contains(entries, key):
+        if not entries.has_key_type(key_type):
+            raise BuiltinError(ErrorType.TYPE_ERROR, "map key type mismatch")
+        return key in entries.entries
+
+    return contains
+
+
+def map_get(key_type, value_type):
+    def get(entries, key, default):
+        if not entries.adopt(value_type):
+            raise BuiltinError(ErrorType.TYPE_ERROR, "map value type mismatch")
+        if not entries.has_key_type(key_type):
+            raise BuiltinError(ErrorType.TYPE_ERROR, "map key type mismatch")
+        return entries.entries.get(key, default)
+
+    return get
+
+
+def map_put(key_type, value_type):
+    def put(entries, key, value):
+        if not entries.adopt(value_type):
+            raise BuiltinError(ErrorType.TYPE_ERROR, "map value type mismatch")
+        if not entries.adopt_key(key_type):
+            raise BuiltinError(ErrorType.TYPE_ERROR, "map key type mismatch")
+        entries.entries[key] = value
+
+    return put
+
+
+def map_builtins():
+    builtins = [("sizei", "m", len)]
+    for key_letter, key_type in KEY_PARAMS.items():
+        builtins.append(("containsb", "m" + key_letter, map_contains(key_type)))
+        for letter, value_type in ELEMENT_PARAMS.items():
+            builtins += [
+                ("get" + letter, "m" + key_letter + letter, map_get(key_type, value_type)),
+                ("putv", "m" + key_letter + letter, map_put(key_type, value_type)),
+            ]
+    return builtins
+
+
+# builtins that change the list or map they are given, so memoized functions can't call them
+MUTATING_BUILTINS = {"appendv", "fillv", "putv"}
+
+# (name, parameter signature, implementation)
+NATIVE_BUILTINS = [
+    # strings
+    ("leni", "s", len),
+    ("findi", "ss", str.find),
+    ("containsb", "ss", lambda s, part: part in s),
+    ("startsb", "ss", str.startswith),
+    ("endsb", "ss", str.endswith),
+    ("substrs", "sii", substr),
+    ("uppers", "s", str.upper),
+    ("lowers", "s", str.lower),
+    ("trims", "s", str.strip),
+    ("repeats", "si", repeat),
+    # math
+    ("absi", "i", abs),
+    ("mini", "ii", min),
+    ("maxi", "ii", max),
+    ("powi", "ii", power),
+    ("modi", "ii", modulo),
+    ("sqrti", "i", sqrt),
+    # conversions
+    ("chars", "i", char),
+    ("ordi", "s", ordinal),
+    # lists
+    *list_builtins(),
+    # maps
+    *map_builtins(),
+]
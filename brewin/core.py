@@ -0,0 +1,466 @@
+"""
+Value model, environment, operators and conversions shared by the typed Brewin
+interpreters (v3 and up). Functions here don't report errors themselves: they
+return None and the interpreter raises the error, so error bookkeeping stays in
+InterpreterBase.
+"""
+
+import operator
+from array import array
+
+from element import Element
+from intbase import InterpreterBase
+
+
+class Type:
+    # type tags are small ints rather than an enum.Enum: they are compared and hashed
+    # (as operator table keys) on every operation, and for ints both are C fast paths
+    NIL = 0  # an uninitialized value (v3)
+    INT = 1
+    STRING = 2
+    BOOL = 3
+    OBJECT = 4
+    VOID = 5
+    ERROR = 6
+    FUNCTION = 7
+    INTERFACE = 8
+    LIST = 9
+    MAP = 10
+
+    @staticmethod
+    def get_type(var_name): #gets type from last letter of function or variable
+        if not var_name:
+            return Type.ERROR
+        last_letter = var_name[-1]
+        if last_letter == "i":
+            return Type.INT
+        if last_letter == "s":
+            return Type.STRING
+        if last_letter == "b":
+            return Type.BOOL
+        if last_letter == "o":
+            return Type.OBJECT
+        if last_letter == "v":
+            return Type.VOID  # only for functions
+        if last_letter == "f":
+            return Type.FUNCTION
+        if last_letter == "l":
+            return Type.LIST  # the letter before says what it holds (see element_type)
+        if last_letter == "m":
+            return Type.MAP  # likewise
+        if last_letter.isupper():
+            return Type.INTERFACE
+        return Type.ERROR
+
+
+DEFAULT_VALUES = {
+    Type.NIL: None,
+    Type.INT: 0,
+    Type.STRING: "",
+    Type.BOOL: False,
+    Type.OBJECT: None,  # representing nil as an object type value with None as its value
+    Type.VOID: None,
+    Type.FUNCTION: None,
+    Type.LIST: None,  # a nil list
+    Type.MAP: None,
+}
+
+
+class Value:
+    # a mutable cell holding a type tag and a raw value. __slots__ keeps each one to
+    # two pointers with no per-instance dict, and an explicit v skips the defaults
+    __slots__ = ("t", "v")
+
+    def __init__(self, t=Type.NIL, v=None):
+        if v is None:
+            if t is None:
+                t = Type.NIL
+            elif t == Type.INTERFACE:  # interface typed values are plain object references
+                t = Type.OBJECT
+            if t not in DEFAULT_VALUES:
+                raise Exception("invalid default value for type")
+            v = DEFAULT_VALUES[t]
+        elif t is None:
+            t = Type.NIL
+        elif t == Type.INTERFACE:
+            t = Type.OBJECT
+        self.t = t
+        self.v = v
+
+    def set(self, other):
+        self.t = other.t
+        self.v = other.v
+
+
+class Environment:
+    # one list of block dicts per active function call, innermost block last
+    def __init__(self):
+        self.env = [[{}]]
+
+    def enter_block(self):
+        self.env[-1].append({})
+
+    def exit_block(self):
+        self.env[-1].pop()
+
+    def enter_func(self, frame=None):
+        # frame: the new function scope's dict, if the caller has already filled it in
+        self.env.append([{} if frame is None else frame])
+
+    def exit_func(self):
+        self.env.pop()
+
+    # define new variable at function scope
+    def fdef(self, varname, value):
+        top_env = self.env[-1]
+        if varname in top_env[0]:
+            return False
+        top_env[0][varname] = value
+        return True
+
+    # define new variable in top block
+    def bdef(self, varname, value):
+        self.env[-1][-1][varname] = value
+        return True
+
+    def exists(self, varname):
+        for block in reversed(self.env[-1]):
+            if varname in block:
+                return True
+        return False
+
+    def get(self, varname):
+        for block in reversed(self.env[-1]):
+            if varname in block:
+                return block[varname]
+        return None
+
+    def set(self, varname, value):
+        for block in reversed(self.env[-1]):
+            if varname in block:
+                block[varname] = value
+                return True
+        return False
+
+
+# strings
+
+class Rope:
+    """
+    The raw value of a string built by concatenation. Concatenating appends to a
+    parts list and the text is only joined when it is needed (str(), printing,
+    comparing, converting), so a loop that keeps extending a string is linear
+    rather than quadratic. Ropes share their parts list with the rope they were
+    extended from; a rope only appends in place while it is the newest view of
+    that list, otherwise it copies its own prefix first.
+    """
+
+    __slots__ = ("parts", "count", "text")
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.count = len(parts)
+        self.text = None
+
+    @staticmethod
+    def concat(left, right):
+        if isinstance(left, Rope):
+            parts = left.parts if left.count == len(left.parts) else left.parts[: left.count]
+        else:
+            parts = [left]
+        parts.append(str(right))
+        return Rope(parts)
+
+    def __str__(self):
+        if self.text is None:
+            self.text = "".join(self.parts[: self.count])
+        return self.text
+
+    def __eq__(self, other):
+        if isinstance(other, (str, Rope)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return repr(str(self))
+
+
+# lists and maps
+
+ELEMENT_TYPES = {Type.INT, Type.STRING, Type.BOOL}
+KEY_TYPES = {Type.INT, Type.STRING}  # bools would collide with the ints 0 and 1
+
+
+def element_type(name):
+    """
+    What a list or map named name holds, from its second to last letter (numsil holds
+    ints, agesim maps to ints); ERROR if that isn't a valid element type
+    """
+    t = Type.get_type(name[:-1])
+    return t if t in ELEMENT_TYPES else Type.ERROR
+
+
+class ListValue:
+    """
+    The raw value of a Brewin list, which like an object is a reference. Elements are
+    stored raw (an int, str or bool) and get wrapped in a Value when read. Int and bool
+    lists keep them in an array.array, machine words and bytes rather than a Python
+    object per element; an int list switches to a plain list if an element ever needs
+    more than 64 bits. An empty list literal has no element type until it is first
+    stored in a list variable, parameter or field (see adopt).
+    """
+
+    __slots__ = ("elem_type", "items", "lid")
+
+    ARRAY_CODES = {Type.INT: "q", Type.BOOL: "B"}
+
+    def __init__(self, elem_type, items=()):
+        self.elem_type = elem_type
+        self.items = ListValue.storage(elem_type, items)
+        self.lid = None  # id in the checkpoint log, once written there
+
+    @staticmethod
+    def storage(elem_type, items):
+        code = ListValue.ARRAY_CODES.get(elem_type)
+        if code is not None:
+            try:
+                return array(code, items)
+            except OverflowError:
+                pass
+        return list(items)
+
+    def adopt(self, elem_type):
+        """Whether the list can be stored where elem_type elements are expected; fixes an untyped list's type"""
+        if self.elem_type is None:
+            self.elem_type = elem_type
+            self.items = ListValue.storage(elem_type, self.items)
+        return self.elem_type == elem_type
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, index):
+        item = self.items[index]
+        return bool(item) if self.elem_type == Type.BOOL else item
+
+    def set(self, index, item):
+        try:
+            self.items[index] = item
+        except OverflowError:
+            self.items = list(self.items)
+            self.items[index] = item
+
+    def append(self, item):
+        try:
+            self.items.append(item)
+        except OverflowError:
+            self.items = list(self.items)
+            self.items.append(item)
+
+    def slice(self, start, end):
+        result = ListValue(None)
+        result.elem_type, result.items = self.elem_type, self.items[start:end]
+        return result
+
+    def fill(self, item):
+        self.items = ListValue.storage(self.elem_type, [item]) * len(self.items)
+
+    def __str__(self):
+        if self.elem_type == Type.BOOL:
+            return "[" + ", ".join("true" if item else "false" for item in self.items) + "]"
+        return "[" + ", ".join(map(str, self.items)) + "]"
+
+
+class MapValue:
+    """
+    The raw value of a Brewin map, a reference like a list. It maps keys of one type,
+    int or string, to values of one type, stored raw in a dict, so a lookup is a
+    single hash probe. An empty map literal gets its value type like [] does, and
+    its key type from the first key stored in it.
+    """
+
+    __slots__ = ("key_type", "value_type", "entries", "mid")
+
+    def __init__(self, value_type, entries=None, key_type=None):
+        self.value_type = value_type
+        self.entries = {} if entries is None else entries
+        if key_type is None and self.entries:
+            key_type = Type.STRING if isinstance(next(iter(self.entries)), str) else Type.INT
+        self.key_type = key_type
+        self.mid = None  # id in the checkpoint log, once written there
+
+    def adopt(self, value_type):
+        """Whether the map can be stored where value_type values are expected; fixes an untyped map's type"""
+        if self.value_type is None:
+            self.value_type = value_type
+        return self.value_type == value_type
+
+    def has_key_type(self, key_type):
+        """Whether keys of key_type can be looked up in the map"""
+        return self.key_type is None or self.key_type == key_type
+
+    def adopt_key(self, key_type):
+        """Whether keys of key_type can be stored in the map; the first one stored fixes its key type"""
+        if self.key_type is None:
+            self.key_type = key_type
+        return self.key_type == key_type
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        if self.value_type == Type.BOOL:
+            items = (f"{key}: {'true' if value else 'false'}" for key, value in self.entries.items())
+        else:
+            items = (f"{key}: {value}" for key, value in self.entries.items())
+        return "{" + ", ".join(items) + "}"
+
+
+# operators
+#
+# OPERATOR_TABLE maps an operator to {(left type, right type): implementation};
+# an implementation takes the two raw operand values and returns the result
+# Value. A pair missing from the table is a type error. Interpreters look the
+# operator part up once per AST node (bind_operators), so evaluating a binary
+# node is a single dict hit on the operand types.
+
+VALUE_TYPES = (Type.NIL, Type.INT, Type.STRING, Type.BOOL, Type.OBJECT, Type.VOID, Type.FUNCTION, Type.LIST, Type.MAP)
+REFERENCE_TYPES = {Type.OBJECT, Type.FUNCTION, Type.LIST, Type.MAP, Type.NIL}
+HEAP_TYPES = {Type.OBJECT, Type.FUNCTION, Type.LIST, Type.MAP}  # nil is an object, so any two compare
+
+BINARY_OPS = {"+", "-", "*", "/", "==", "!=", ">", ">=", "<", "<=", "||", "&&"}
+
+
+def int_result(op):
+    return lambda a, b: Value(Type.INT, op(a, b))
+
+
+def bool_result(op):
+    return lambda a, b: Value(Type.BOOL, op(a, b))
+
+
+def constant(result):
+    return lambda a, b: Value(Type.BOOL, result)
+
+
+def equality_impl(tl, tr, negate):
+    if tl in REFERENCE_TYPES and tr in REFERENCE_TYPES:
+        # objects, functions, lists and maps compare by identity; nil object == nil function
+        if tl == tr or (tl in HEAP_TYPES and tr in HEAP_TYPES):
+            return bool_result(operator.is_not if negate else operator.is_)
+        return constant(negate)
+    if tl != tr:
+        return constant(negate)
+    return bool_result(operator.ne if negate else operator.eq)
+
+
+def build_operator_table():
+    table = {kind: {} for kind in BINARY_OPS}
+    table["+"][Type.STRING, Type.STRING] = lambda a, b: Value(Type.STRING, Rope.concat(a, b))
+    for kind, op in (("+", operator.add), ("-", operator.sub), ("*", operator.mul), ("/", operator.floordiv)):
+        table[kind][Type.INT, Type.INT] = int_result(op)
+    for kind, op in (("<", operator.lt), ("<=", operator.le), (">", operator.gt), (">=", operator.ge)):
+        table[kind][Type.INT, Type.INT] = bool_result(op)
+    table["&&"][Type.BOOL, Type.BOOL] = bool_result(lambda a, b: a and b)
+    table["||"][Type.BOOL, Type.BOOL] = bool_result(lambda a, b: a or b)
+    for tl in VALUE_TYPES:
+        for tr in VALUE_TYPES:
+            table["=="][tl, tr] = equality_impl(tl, tr, negate=False)
+            table["!="][tl, tr] = equality_impl(tl, tr, negate=True)
+    return table
+
+
+OPERATOR_TABLE = build_operator_table()
+
+
+# in short-circuit mode, the left operand value that decides && and || alone
+SHORT_CIRCUIT = {"&&": False, "||": True}
+
+
+def bind_operators(ast, bound=None, kinds=BINARY_OPS):
+    """Maps every binary operator node under ast whose operator is in kinds to its OPERATOR_TABLE entry"""
+    bound = {} if bound is None else bound
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, Element):
+            continue
+        if node.elem_type in kinds:
+            bound[node] = OPERATOR_TABLE[node.elem_type]
+        stack.extend(node.dict.values())
+    return bound
+
+
+def eval_binary_op(kind, vl, vr):
+    """Value of vl <kind> vr, or None if the operator doesn't apply to these types"""
+    impl = OPERATOR_TABLE[kind].get((vl.t, vr.t))
+    return None if impl is None else impl(vl.v, vr.v)
+
+
+# scopes
+
+def needs_block_scope(statement):
+    """
+    Whether the body of an if or while defines names in its own block, i.e. has a bvar
+    directly in it. var defines at function scope and nested ifs/whiles get their own
+    blocks, so every other body can run without allocating a block dict.
+    """
+    for key in ("statements", "else_statements"):
+        for child in statement.get(key) or ():
+            if child.elem_type == InterpreterBase.BVAR_DEF_NODE:
+                return True
+    return False
+
+
+# conversions
+
+def parse_int(s, features):
+    if features.signed_int_strings:
+        try:
+            return int(s)
+        except ValueError:
+            return None
+    return int(s) if s.isdigit() else None
+
+
+def convert(to_type, val, features):
+    """val converted by int(), str() or bool(); None if that conversion isn't allowed"""
+    if to_type == "int":
+        if val.t == Type.INT:
+            return val
+        if val.t == Type.STRING:
+            i = parse_int(str(val.v), features)
+            return None if i is None else Value(Type.INT, i)
+        if val.t == Type.BOOL:
+            return Value(Type.INT, 1 if val.v else 0)
+    elif to_type == "str":
+        if val.t == Type.STRING:
+            return val
+        if val.t == Type.INT:
+            return Value(Type.STRING, str(val.v))
+        if val.t == Type.BOOL:
+            return Value(Type.STRING, "true" if val.v else "false")
+    elif to_type == "bool":
+        if val.t == Type.BOOL:
+            return val
+        if val.t == Type.INT:
+            return Value(Type.BOOL, val.v != 0)
+        if val.t == Type.STRING:
+            return Value(Type.BOOL, str(val.v) != "")
+    return None
+
+
+def print_string(value):
+    if value.t == Type.BOOL:
+        return "true" if value.v else "false"
+    return str(value.v)
@@ -0,0 +1,36 @@
+from copy import copy
+
+
+class Features:
+    """
+    The semantics the shared core has to pick between for one Brewin version. Only
+    differences the shared code actually branches on live here; which statements and
+    types a version has is still decided by its own interpretervN.Interpreter class.
+    """
+
+    def __init__(
+        self,
+        version,
+        signed_int_strings=False,  # int("-5") converts rather than failing
+        short_circuit=False,  # && and || skip the right operand once the left decides
+    ):
+        self.version = version
+        self.signed_int_strings = signed_int_strings
+        self.short_circuit = short_circuit
+
+    def with_options(self, **options):
+        """A copy of these features with some flags changed (e.g. opt-in modes)"""
+        features = copy(self)
+        for name, value in options.items():
+            if not hasattr(features, name):
+                raise ValueError(f"unknown language feature {name}")
+            setattr(features, name, value)
+        return features
+
+
+FEATURES = {
+    1: Features(1),
+    2: Features(2),
+    3: Features(3),
+    4: Features(4, signed_int_strings=True),
+}
@@ -0,0 +1,373 @@
+"""
+Brewin to Python backend for interpreterv4: each function of a program (every
+overload, keyed by name and parameter type signature) becomes one Python
+function, the whole module is compiled once with compile() and main is called
+directly, with Brewin variables as Python locals.
+
+Every name has a fixed type from its suffix, so in the subset supported here
+the type of every expression is known when translating, and the checks the tree
+walker makes at run time are decided up front: a well typed operation becomes
+plain Python, and one that would fail becomes a call that evaluates the same
+operands in the same order and then raises the interpreter's error, so output
+and ErrorType semantics are unchanged.
+
+The subset is ints, strings and bools: no objects, nil, lambdas, function
+values, interfaces, reference parameters or bvar, and var only directly in a
+function's body. transpile() raises Unsupported for anything else and the
+interpreter runs the program with the tree walker instead.
+"""
+
+from intbase import InterpreterBase, ErrorType
+from brewin.builtins import BuiltinError
+from brewin.core import Type
+
+SUPPORTED_TYPES = {Type.INT, Type.STRING, Type.BOOL}
+SIGNATURE_LETTERS = {Type.INT: "i", Type.STRING: "s", Type.BOOL: "b"}
+DEFAULTS = {Type.INT: "0", Type.STRING: '""', Type.BOOL: "False"}
+
+# (operator, type of both operands) -> (result type, python operator)
+TYPED_OPERATORS = {
+    ("+", Type.INT): (Type.INT, "+"),
+    ("-", Type.INT): (Type.INT, "-"),
+    ("*", Type.INT): (Type.INT, "*"),
+    ("/", Type.INT): (Type.INT, "//"),
+    ("<", Type.INT): (Type.BOOL, "<"),
+    ("<=", Type.INT): (Type.BOOL, "<="),
+    (">", Type.INT): (Type.BOOL, ">"),
+    (">=", Type.INT): (Type.BOOL, ">="),
+    ("+", Type.STRING): (Type.STRING, "+"),
+    ("&&", Type.BOOL): (Type.BOOL, "and"),
+    ("||", Type.BOOL): (Type.BOOL, "or"),
+}
+
+
+class Unsupported(Exception):
+    """The program uses something the Python backend doesn't translate"""
+
+
+def function_name(name, signature):
+    return f"f_{name}_{signature}"
+
+
+def builtin_name(name, signature):
+    return f"b_{name}_{signature}"
+
+
+def var_name(name):
+    return "v_" + name  # never a Python keyword or builtin
+
+
+class FunctionTranspiler:
+    def __init__(self, program, func, signature):
+        self.program = program
+        self.func = func
+        self.lines = []
+        self.declared = set()
+
+        if func.return_type not in SUPPORTED_TYPES and func.return_type != Type.VOID:
+            raise Unsupported(f"return type of {func.name}")
+        params = []
+        for name, ref in func.formal_args.items():
+            if ref or Type.get_type(name) not in SUPPORTED_TYPES:
+                raise Unsupported(f"parameter {name} of {func.name}")
+            params.append(var_name(name))
+            self.declared.add(name)
+        self.header = f"def {function_name(func.name, signature)}({', '.join(params)}):"
+
+    def transpile(self):
+        self.lines.append(self.header)
+        self.statements(self.func.statements, 1, top_level=True)
+        self.emit(1, f"return {self.default(self.func.return_type)}")
+        return self.lines
+
+    def emit(self, depth, line):
+        self.lines.append("    " * depth + line)
+
+    def default(self, t):
+        return DEFAULTS.get(t, "None")
+
+    def text(self, code, t):
+        # what print shows for a value
+        if t == Type.STRING or t == Type.ERROR:
+            return code
+        if t == Type.INT:
+            return f"str({code})"
+        if t == Type.BOOL:
+            return f'("true" if {code} else "false")'
+        return self.fail("ErrorType.TYPE_ERROR", "cannot pass void argument to function", code)
+
+    def fail(self, error_type, message, *operands):
+        # evaluates operands (left to right, as the tree walker would) and then raises
+        return f"fail({error_type}, {message!r}, {', '.join(operands)})"
+
+    # statements
+
+    def statements(self, statements, depth, top_level=False):
+        if not statements:
+            self.emit(depth, "pass")
+            return
+        for statement in statements:
+            kind = statement.elem_type
+            if kind == InterpreterBase.VAR_DEF_NODE:
+                if not top_level:
+                    raise Unsupported("var in a nested block")
+                self.vardef(statement, depth)
+            elif kind == "=":
+                self.assign(statement, depth)
+            elif kind == InterpreterBase.FCALL_NODE:
+                code, _ = self.fcall(statement)
+                self.emit(depth, code)
+            elif kind == InterpreterBase.IF_NODE:
+                self.if_statement(statement, depth)
+            elif kind == InterpreterBase.WHILE_NODE:
+                cond = self.condition(statement.get("condition"))
+                self.emit(depth, f"while {cond}:")
+                self.statements(statement.get("statements"), depth + 1)
+            elif kind == InterpreterBase.RETURN_NODE:
+                self.return_statement(statement, depth)
+            else:
+                raise Unsupported(kind)
+
+    def vardef(self, statement, depth):
+        name = statement.get("name")
+        t = Type.get_type(name)
+        if t not in SUPPORTED_TYPES:
+            raise Unsupported(f"variable {name}")
+        if name in self.declared:
+            self.emit(depth, self.fail("ErrorType.NAME_ERROR", "variable already defined"))
+            return
+        self.declared.add(name)
+        self.emit(depth, f"{var_name(name)} = {self.default(t)}")
+
+    def assign(self, statement, depth):
+        name = statement.get("var")
+        if "." in name:
+            raise Unsupported("object member assignment")
+        code, t = self.expr(statement.get("expression"))
+        if name not in self.declared:
+            if name in self.program.function_names:
+                raise Unsupported("assignment to a function name")
+            self.emit(depth, self.fail("ErrorType.NAME_ERROR", "variable not defined", code))
+        elif t != Type.ERROR and t != Type.get_type(name):
+            self.emit(depth, self.fail("ErrorType.TYPE_ERROR", "type mismatch in assignment", code))
+        else:
+            self.emit(depth, f"{var_name(name)} = {code}")
+
+    def if_statement(self, statement, depth):
+        cond = self.condition(statement.get("condition"))
+        self.emit(depth, f"if {cond}:")
+        self.statements(statement.get("statements"), depth + 1)
+        if statement.get("else_statements"):
+            self.emit(depth, "else:")
+            self.statements(statement.get("else_statements"), depth + 1)
+
+    def condition(self, expr):
+        code, t = self.expr(expr)
+        if t != Type.BOOL and t != Type.ERROR:
+            return self.fail("ErrorType.TYPE_ERROR", "condition must be boolean", code)
+        return code
+
+    def return_statement(self, statement, depth):
+        expr = statement.get("expression")
+        if not expr:
+            self.emit(depth, f"return {self.default(self.func.return_type)}")
+            return
+        code, t = self.expr(expr)
+        if t != Type.ERROR and t != self.func.return_type:
+            self.emit(depth, self.fail("ErrorType.TYPE_ERROR", "return type mismatch", code))
+        else:
+            self.emit(depth, f"return {code}")
+
+    # expressions: each returns (python code, Brewin type), Type.ERROR if it always raises
+
+    def expr(self, expr):
+        kind = expr.elem_type
+        if kind == InterpreterBase.INT_NODE:
+            return repr(expr.get("val")), Type.INT
+        if kind == InterpreterBase.STRING_NODE:
+            return repr(expr.get("val")), Type.STRING
+        if kind == InterpreterBase.BOOL_NODE:
+            return repr(bool(expr.get("val"))), Type.BOOL
+        if kind == InterpreterBase.QUALIFIED_NAME_NODE:
+            return self.name(expr.get("name"))
+        if kind == InterpreterBase.FCALL_NODE:
+            return self.fcall(expr)
+        if kind in self.program.binary_ops:
+            return self.binary_op(kind, expr)
+        if kind == InterpreterBase.NEG_NODE:
+            return self.unary(expr, Type.INT, "-", "cannot negate non-integer")
+        if kind == InterpreterBase.NOT_NODE:
+            return self.unary(expr, Type.BOOL, "not ", "cannot apply NOT to non-boolean")
+        if kind == InterpreterBase.CONVERT_NODE:
+            return self.convert(expr)
+        raise Unsupported(kind)
+
+    def name(self, name):
+        if "." in name:
+            raise Unsupported("object member access")
+        if name in self.declared:
+            return var_name(name), Type.get_type(name)
+        if name in self.program.function_names:
+            raise Unsupported("function value")
+        return self.fail("ErrorType.NAME_ERROR", "variable not defined"), Type.ERROR
+
+    def unary(self, expr, operand_type, op, message):
+        code, t = self.expr(expr.get("op1"))
+        if t == Type.ERROR:
+            return code, t
+        if t != operand_type:
+            return self.fail("ErrorType.TYPE_ERROR", message, code), Type.ERROR
+        return f"({op}{code})", operand_type
+
+    def binary_op(self, kind, expr):
+        left, tl = self.expr(expr.get("op1"))
+        right, tr = self.expr(expr.get("op2"))
+        if tl == Type.ERROR or tr == Type.ERROR:
+            return f"({left}, {right})", Type.ERROR  # raises while evaluating an operand
+        if kind in ("&&", "||") and self.program.short_circuit:
+            return self.short_circuit(kind, left, tl, right, tr)
+        if kind in ("==", "!="):
+            if tl != tr:
+                return f"({left}, {right}, {kind == '!='})[-1]", Type.BOOL
+            return f"({left} {kind} {right})", Type.BOOL
+        entry = TYPED_OPERATORS.get((kind, tl))
+        if entry is None or tl != tr:
+            return self.fail("ErrorType.TYPE_ERROR", "invalid binary operation", left, right), Type.ERROR
+        result_type, op = entry
+        if op in ("and", "or"):
+            # both operands are evaluated, as they are without short_circuit
+            return f"both_{op}({left}, {right})", result_type
+        return f"({left} {op} {right})", result_type
+
+    def short_circuit(self, kind, left, tl, right, tr):
+        op = "and" if kind == "&&" else "or"
+        if tl != Type.BOOL:
+            return self.fail("ErrorType.TYPE_ERROR", "invalid binary operation", left), Type.ERROR
+        if tr != Type.BOOL:
+            right = self.fail("ErrorType.TYPE_ERROR", "invalid binary operation", right)
+        return f"({left} {op} {right})", Type.BOOL
+
+    def convert(self, expr):
+        code, t = self.expr(expr.get("expr"))
+        to_type = expr.get("to_type")
+        if t == Type.ERROR:
+            return code, t
+        if t not in SUPPORTED_TYPES:
+            return self.fail("ErrorType.TYPE_ERROR", f"cannot convert to {to_type}", code), Type.ERROR
+        if to_type == "int":
+            if t == Type.INT:
+                return code, Type.INT
+            if t == Type.STRING:
+                return f"int_of_str({code})", Type.INT
+            return f"(1 if {code} else 0)", Type.INT
+        if to_type == "str":
+            if t == Type.STRING:
+                return code, Type.STRING
+            if t == Type.INT:
+                return f"str({code})", Type.STRING
+            return f'("true" if {code} else "false")', Type.STRING
+        if to_type == "bool":
+            if t == Type.BOOL:
+                return code, Type.BOOL
+            if t == Type.INT:
+                return f"({code} != 0)", Type.BOOL
+            return f'({code} != "")', Type.BOOL
+        raise Unsupported(f"conversion to {to_type}")
+
+    def fcall(self, expr):
+        name = expr.get("name")
+        if "." in name:
+            raise Unsupported("method call")
+        if name in self.declared:
+            raise Unsupported("call through a variable")
+        args = [self.expr(a) for a in expr.get("args")]
+        codes = [code for code, _ in args]
+
+        if name == "print":
+            parts = [self.text(code, t) for code, t in args]
+            return f"output(''.join([{', '.join(parts)}]))", Type.VOID
+        if name in ("inputi", "inputs"):
+            if len(args) > 1:
+                return self.fail("ErrorType.NAME_ERROR", "too many arguments for input function"), Type.ERROR
+            read = "int(get_input())" if name == "inputi" else "get_input()"
+            if args:  # the prompt is printed first
+                read = f"(output({self.text(*args[0])}), {read})[-1]"
+            return read, Type.INT if name == "inputi" else Type.STRING
+
+        if any(t == Type.ERROR for _, t in args):
+            return f"({', '.join(codes)},)", Type.ERROR
+        if any(t not in SUPPORTED_TYPES for _, t in args):
+            raise Unsupported("void argument")
+        signature = "".join(SIGNATURE_LETTERS[t] for _, t in args)
+        func = self.program.funcs.get((name, signature))
+        if func is None and (name, signature) in self.program.builtins:
+            builtin = self.program.builtins[(name, signature)]
+            if builtin.return_type not in SUPPORTED_TYPES and builtin.return_type != Type.VOID:
+                raise Unsupported(f"{builtin.return_type} result of {name}")
+            return f"{builtin_name(name, signature)}({', '.join(codes)})", builtin.return_type
+        if func is None:
+            return self.fail("ErrorType.NAME_ERROR", "function not found", *codes), Type.ERROR
+        return f"{function_name(name, signature)}({', '.join(codes)})", func.return_type
+
+
+class ProgramTranspiler:
+    def __init__(self, funcs, binary_ops, short_circuit=False, builtins=None):
+        self.funcs = funcs
+        self.builtins = builtins or {}
+        self.function_names = {name for name, _ in funcs}
+        self.binary_ops = binary_ops
+        self.short_circuit = short_circuit
+
+    def transpile(self):
+        lines = []
+        for (_, signature), func in self.funcs.items():
+            lines += FunctionTranspiler(self, func, signature).transpile()
+            lines.append("")
+        return "\n".join(lines)
+
+
+def transpile(funcs, binary_ops, short_circuit=False, builtins=None):
+    """Python source for a function table ({(name, signature): Function}); raises Unsupported"""
+    return ProgramTranspiler(funcs, binary_ops, short_circuit, builtins).transpile()
+
+
+def compile_program(interpreter, funcs, binary_ops, short_circuit=False, builtins=None):
+    """Compiles a loaded program; returns its main as a Python callable, or raises Unsupported"""
+    builtins = builtins or {}
+    source = transpile(funcs, binary_ops, short_circuit, builtins)
+
+    def fail(error_type, message, *evaluated):
+        interpreter.error(error_type, message)
+
+    def int_of_str(s):
+        try:
+            return int(s)
+        except ValueError:
+            interpreter.error(ErrorType.TYPE_ERROR, "cannot convert string to int")
+
+    namespace = {
+        "ErrorType": ErrorType,
+        "fail": fail,
+        "int_of_str": int_of_str,
+        "both_and": lambda a, b: a and b,
+        "both_or": lambda a, b: a or b,
+        "output": interpreter.output,
+        "get_input": interpreter.get_input,
+    }
+    for (name, signature), builtin in builtins.items():
+        namespace[builtin_name(name, signature)] = wrap_builtin(interpreter, builtin)
+    exec(compile(source, "<brewin>", "exec"), namespace)
+    main = namespace.get(function_name("main", ""))
+    if main is None:
+        return lambda: interpreter.error(ErrorType.NAME_ERROR, "function not found")
+    return main
+
+
+def wrap_builtin(interpreter, builtin):
+    def call(*args):
+        try:
+            return builtin.call(args)
+        except BuiltinError as e:
+            interpreter.error(e.error_type, str(e))
+
+    return call
@@ -27,7 +27,10 @@ tokens = reserved + (
     "RPAREN",
     "LBRACE",
     "RBRACE",
+    "LBRACKET",
+    "RBRACKET",
     "COMMA",
+    "COLON",
     "SEMI",
     "EQ",
     "NOT_EQ",
@@ -65,7 +68,10 @@ literals = [
     ",",
     "{",
     "}",
+    "[",
+    "]",
     ";",
+    ":",
     ">",
     "<",
     '"',
@@ -81,8 +87,11 @@ t_LPAREN = r"\("
 t_RPAREN = r"\)"
 t_LBRACE = r"\{"
 t_RBRACE = r"\}"
+t_LBRACKET = r"\["
+t_RBRACKET = r"\]"
 t_COMMA = r","
 t_SEMI = r";"
+t_COLON = r":"
 t_EQ = r"=="
 t_GREATER_EQ = r">="
 t_GREATER = r">"
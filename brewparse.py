@@ -1,3 +1,7 @@
+import mmap
+import os
+import re
+from contextlib import contextmanager
 from element import Element
 from brewlex import *
 from intbase import InterpreterBase
@@ -103,6 +107,11 @@ def p_assign(p):
     "assign : qualified_name ASSIGN expression"
     p[0] = Element("=", var=p[1], expression=p[3])
 
+def p_assign_index(p):
+    "assign : qualified_name LBRACKET expression RBRACKET ASSIGN expression"
+    var = Element(InterpreterBase.QUALIFIED_NAME_NODE, name=p[1])
+    p[0] = Element(InterpreterBase.INDEX_ASSIGN_NODE, var=var, index=p[3], expression=p[6])
+
 def p_statement___fvar(p):
     "statement : VAR qualified_name_no_dot SEMI" 
     p[0] = Element(InterpreterBase.VAR_DEF_NODE, name=p[2])
@@ -232,7 +241,10 @@ def p_expression_closure(p):
 
 def p_expression_empty_obj(p):
     "expression : AT"
-    p[0] = Element(InterpreterBase.EMPTY_OBJ_NODE)
+    # line and col identify the allocation site, even with several @ on one line
+    pos = p.lexpos(1)
+    col = pos - p.lexer.lexdata.rfind("\n", 0, pos)
+    p[0] = Element(InterpreterBase.EMPTY_OBJ_NODE, line=p.lineno(1), col=col)
 
 def p_expression_nil(p):
     "expression : NIL"
@@ -241,10 +253,44 @@ def p_expression_nil(p):
 def p_func_call(p):
     """expression : qualified_name LPAREN args RPAREN
     | qualified_name LPAREN RPAREN"""
-    if len(p) == 5:
-        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=p[3])
+    args = p[3] if len(p) == 5 else []
+    if "." in p[1]:  # a method call: the receiver is looked up like any other name
+        objref, method = p[1].rsplit(".", 1)
+        objref = Element(InterpreterBase.QUALIFIED_NAME_NODE, name=objref)
+        p[0] = Element(InterpreterBase.METHOD_CALL_NODE, objref=objref, name=method, args=args)
+    else:
+        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=args)
+
+
+def p_expression_list(p):
+    """expression : LBRACKET args RBRACKET
+    | LBRACKET RBRACKET"""
+    elements = p[2] if len(p) == 4 else []
+    p[0] = Element(InterpreterBase.LIST_NODE, elements=elements)
+
+
+def p_expression_map(p):
+    """expression : LBRACE entries RBRACE
+    | LBRACE RBRACE"""
+    keys, values = p[2] if len(p) == 4 else ([], [])
+    p[0] = Element(InterpreterBase.MAP_NODE, keys=keys, values=values)
+
+
+def p_entries(p):
+    """entries : entries COMMA expression COLON expression
+    | expression COLON expression"""
+    if len(p) == 4:
+        p[0] = ([p[1]], [p[3]])
     else:
-        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=[])
+        p[0] = p[1]
+        p[0][0].append(p[3])
+        p[0][1].append(p[5])
+
+
+def p_expression_index(p):
+    "expression : qualified_name LBRACKET expression RBRACKET"
+    var = Element(InterpreterBase.QUALIFIED_NAME_NODE, name=p[1])
+    p[0] = Element(InterpreterBase.INDEX_NODE, var=var, index=p[3])
 
 
 def p_expression_variable(p):
@@ -277,7 +323,7 @@ def p_error(p):
 # exported function
 def parse_program(program, plot = False):
     reset_lineno()
-    ast = yacc.parse(program)
+    ast = parser.parse(program, lexer=lexer)
     if ast is None:
         raise SyntaxError("Syntax error")
     
@@ -289,5 +335,127 @@ def parse_program(program, plot = False):
     return ast
 
 
+# streaming parser for large source files
+
+# between top-level definitions only whitespace and comments are allowed
+top_level_token = re.compile(rb"\s+|/\*.*?\*/|(interface|def)\b", re.DOTALL)
+# inside a definition we only care about braces, but not the ones in comments/strings
+body_token = re.compile(rb'/\*.*?\*/|"[^"\n]*"|[{}]', re.DOTALL)
+
+definition_parsers = {}
+
+
+def get_definition_parser(kind):
+    # parsers whose start symbol is a single interface or func, built on first use
+    if kind not in definition_parsers:
+        definition_parsers[kind] = yacc.yacc(
+            start=kind,
+            debug=False,
+            write_tables=False,
+            errorlog=yacc.NullLogger(),
+        )
+    return definition_parsers[kind]
+
+
+@contextmanager
+def mapped_source(source):
+    """Opens a path or file object as a read-only memory-mapped byte buffer"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as handle:
+            with mapped_source(handle) as buf:
+                yield buf
+        return
+
+    try:
+        fileno = source.fileno()
+    except (AttributeError, OSError):
+        fileno = None
+
+    if fileno is None:  # e.g. io.StringIO, nothing to map
+        data = source.read()
+        yield data.encode("utf-8") if isinstance(data, str) else data
+    elif os.fstat(fileno).st_size == 0:  # mmap refuses empty files
+        yield b""
+    else:
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def split_definitions(buf):
+    """Yields (kind, line number, source text) for each top-level definition in buf"""
+    pos, lineno = 0, 1
+    while pos < len(buf):
+        m = top_level_token.match(buf, pos)
+        if m is None:
+            print(f"Syntax error on line {lineno}")
+            raise SyntaxError("Syntax error")
+        if m.group(1) is None:  # whitespace or comment
+            lineno += buf[pos : m.end()].count(b"\n")
+            pos = m.end()
+            continue
+
+        depth = 0
+        for tok in body_token.finditer(buf, m.end()):
+            if tok.group() == b"{":
+                depth += 1
+            elif tok.group() == b"}":
+                depth -= 1
+                if depth == 0:
+                    break
+        else:
+            print("Syntax error at EOF")
+            raise SyntaxError("Syntax error")
+
+        chunk = buf[pos : tok.end()]
+        kind = "func" if m.group(1) == b"def" else "interface"
+        yield kind, lineno, chunk.decode("utf-8")
+        lineno += chunk.count(b"\n")
+        pos = tok.end()
+
+
+# exported function
+def parse_definitions(source):
+    """
+    Yields the top-level interface and func nodes of a Brewin source file one at a time.
+    source is a path or an open file; the file is memory mapped and each definition is
+    lexed and parsed on its own, so neither the whole text nor the whole token list is
+    ever held in memory.
+    """
+    with mapped_source(source) as buf:
+        for kind, lineno, text in split_definitions(buf):
+            lexer.lineno = lineno
+            node = get_definition_parser(kind).parse(text, lexer=lexer)
+            if node is None:
+                raise SyntaxError("Syntax error")
+            yield node
+
+
+# exported function
+def parse_program_file(source, plot = False):
+    interfaces, functions = [], []
+    for node in parse_definitions(source):
+        if node.elem_type == InterpreterBase.INTERFACE_NODE:
+            if functions:  # same ordering rule as the grammar
+                print("Syntax error at 'interface'")
+                raise SyntaxError("Syntax error")
+            interfaces.append(node)
+        else:
+            functions.append(node)
+    if not functions:
+        print("Syntax error at EOF")
+        raise SyntaxError("Syntax error")
+
+    if interfaces:
+        ast = Element(InterpreterBase.PROGRAM_NODE, interfaces=interfaces, functions=functions)
+    else:
+        ast = Element(InterpreterBase.PROGRAM_NODE, functions=functions)
+
+    if plot:
+        from plot import plot_ast
+        plot_ast(ast)
+
+    return ast
+
+
 # generate our parser
-yacc.yacc() # yacc.yacc(debug=True, debuglog=open("parse.log", "w"))
+parser = yacc.yacc() # yacc.yacc(debug=True, debuglog=open("parse.log", "w"))
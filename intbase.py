@@ -23,6 +23,7 @@ class InterpreterBase:
     BOOL_NODE = "bool"
     STRING_NODE = "string"
     FCALL_NODE = "fcall"
+    METHOD_CALL_NODE = "mcall"  # var1.var2.methodf(...)
     QUALIFIED_NAME_NODE = "qname"  # var_name, var1.var2.var3, funcname
     NOT_NODE = "!"
     VAR_DEF_NODE = "vardef"
@@ -35,6 +36,10 @@ class InterpreterBase:
     FIELD_FUNC_NODE = "field_func"
     FIELD_VAR_NODE = "field_var"
     ASSIGNMENT_NODE = "="
+    LIST_NODE = "list"  # [e1, e2, ...]
+    MAP_NODE = "map"  # {k1: v1, k2: v2, ...}
+    INDEX_NODE = "index"  # xil[i], xim[k]
+    INDEX_ASSIGN_NODE = "[]="  # xil[i] = e, xim[k] = e
 
     # other constants
     TRUE_DEF = "true"
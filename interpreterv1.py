@@ -9,7 +9,8 @@ class Interpreter(InterpreterBase):
   
 
   def run(self, program):
-    ast = parse_program(program, False)
+    # program is either Brewin source or an already parsed program node
+    ast = parse_program(program, False) if isinstance(program, str) else program
     self.variable_name_to_value = {}
     if ast.elem_type == "program": 
       func_def_node = ast.get("functions") 
@@ -75,6 +76,23 @@ class Interpreter(InterpreterBase):
           f"Function {statement_node.get('name')} has not been defined",
         )
 
+    elif statement_node.elem_type == "mcall": # xo.f(): v1 has no objects, so no such function
+      self.method_call_error(statement_node)
+
+    elif statement_node.elem_type == "[]=": # the parser accepts v4 lists, v1 has none
+      super().error(
+        ErrorType.TYPE_ERROR,
+        "Lists are not supported",
+      )
+
+
+  def method_call_error(self, call_node):
+    name = call_node.get("objref").get("name") + "." + call_node.get("name")
+    super().error(
+      ErrorType.NAME_ERROR,
+      f"Function {name} has not been defined",
+    )
+
 
   def do_assignment(self, statement_node):
     #print("do assigment starting now~~~~~~~~~~~~~~~~~~~~~~~") ###
@@ -117,6 +135,21 @@ class Interpreter(InterpreterBase):
           ErrorType.TYPE_ERROR,
           "Incompatible types for arithmetic operation",
         )
+    elif (expression_node.elem_type == "list") or (expression_node.elem_type == "index"):
+      super().error(
+        ErrorType.TYPE_ERROR,
+        "Lists are not supported",
+      )
+
+    elif expression_node.elem_type == "mcall":
+      self.method_call_error(expression_node)
+
+    elif expression_node.elem_type == "map":
+      super().error(
+        ErrorType.TYPE_ERROR,
+        "Maps are not supported",
+      )
+
     elif expression_node.elem_type == "fcall":
         if expression_node.get("name") == "inputi":
           args = expression_node.get("args")
@@ -37,7 +37,8 @@ class Interpreter(InterpreterBase):
         self.env = Environment()
 
     def run(self, program):
-        ast = parse_program(program, generate_image)
+        # program is either Brewin source or an already parsed program node
+        ast = parse_program(program, generate_image) if isinstance(program, str) else program
 
         for func in ast.get("functions"):
             self.funcs[func.get("name"), len(func.get("args"))] = func #store key so we can recognize functions w the same name but diff num of params
@@ -61,6 +62,10 @@ class Interpreter(InterpreterBase):
             elif kind == self.RETURN_NODE:
                 self.__run_return(statement)
                 return None
+            elif kind == self.METHOD_CALL_NODE:  # xo.f(): v2 has no objects
+                super().error(ErrorType.NAME_ERROR, "unknown function")
+            elif kind == self.INDEX_ASSIGN_NODE:
+                super().error(ErrorType.TYPE_ERROR, "lists are not supported")
             else:
                 super().error(ErrorType.NAME_ERROR, "unknown kind detected") #idk if this we required
 
@@ -153,6 +158,10 @@ class Interpreter(InterpreterBase):
                 elif kind == self.RETURN_NODE:
                     returned = self.__run_return(statement)
                     break
+                elif kind == self.METHOD_CALL_NODE:
+                    super().error(ErrorType.NAME_ERROR, "unknown function")
+                elif kind == self.INDEX_ASSIGN_NODE:
+                    super().error(ErrorType.TYPE_ERROR, "lists are not supported")
 
             self.env = prev_env
             return returned
@@ -253,7 +262,16 @@ class Interpreter(InterpreterBase):
 
         elif kind == self.FCALL_NODE:
             return self.__run_fcall(expr)
-        
+
+        elif kind == self.LIST_NODE or kind == self.INDEX_NODE:  # v4 syntax the parser accepts
+            super().error(ErrorType.TYPE_ERROR, "lists are not supported")
+
+        elif kind == self.MAP_NODE:
+            super().error(ErrorType.TYPE_ERROR, "maps are not supported")
+
+        elif kind == self.METHOD_CALL_NODE:
+            super().error(ErrorType.NAME_ERROR, "unknown function")
+
 
     def __run_stmts(self, statements): #~~~~~~~~~~~~~~~~~~~~
         for stmts in statements:
@@ -275,6 +293,10 @@ class Interpreter(InterpreterBase):
                     return returned
             elif kind == self.RETURN_NODE:
                 return self.__run_return(stmts)
+            elif kind == self.METHOD_CALL_NODE:  # xo.f(): v2 has no objects
+                super().error(ErrorType.NAME_ERROR, "unknown function")
+            elif kind == self.INDEX_ASSIGN_NODE:
+                super().error(ErrorType.TYPE_ERROR, "lists are not supported")
             else:
                 super().error(ErrorType.NAME_ERROR, "unknown statement type")
         return None
@@ -1,99 +1,25 @@
 from intbase import InterpreterBase, ErrorType
 from brewparse import parse_program
-import enum
-
-
-class Type(enum.Enum):
-    NIL = 0
-    INT = 1
-    STRING = 2
-    BOOL = 3
-    OBJECT = 4
-    VOID = 5
-
-
-class Value:
-    def __init__(self, t=None, v=None):
-        if t is None:
-            self.t = Type.NIL
-            self.v = None
-        else:
-            self.t = t
-            self.v = v
-
-
-class Environment:
-    def __init__(self):
-        self.env = []
-
-    def enter_block(self):
-        self.env[-1].append({})
-
-    def exit_block(self):
-        self.env[-1].pop()
-
-    def enter_func(self):
-        self.env.append([{}])
-
-    def exit_func(self):
-        self.env.pop()
-
-    # define new variable at function scope
-    def fdef(self, varname):
-        if self.exists_in_func(varname):
-            return False
-        top_env = self.env[-1]
-        top_env[0][varname] = Value()
-        return True
-
-    #define new variable at block scope
-    def bdef(self, varname):
-        if self.exists_in_func(varname):
-            return False
-        top_env = self.env[-1]
-        top_env[-1][varname] = Value()
-        return True
-    
-    #check if exists in current function scope
-    def exists_in_func(self, varname):
-        for block in self.env[-1]:
-            if varname in block:
-                return True
-        return False
-
-    def exists(self, varname): #check if exists in current scope
-        for block in self.env[-1]:
-            if varname in block:
-                return True
-        return False
-
-    def get(self, varname):
-        top_env = self.env[-1]
-        for block in top_env:
-            if varname in block:
-                return block[varname]
-        return None
-
-    def set(self, varname, value):
-        if not self.exists(varname):
-            return False
-        top_env = self.env[-1]
-        for block in top_env:
-            if varname in block:
-                block[varname] = value
-        return True
+from brewin.core import Type, Value, Environment, BINARY_OPS, OPERATOR_TABLE, bind_operators, needs_block_scope, convert, print_string
+from brewin.features import FEATURES
 
 
 class Interpreter(InterpreterBase):
     def __init__(self, console_output=True, inp=None, trace_output=False):
         super().__init__(console_output, inp)
         self.funcs = {}
+        self.features = FEATURES[3]
         self.env = Environment()
-        self.bops = {"+", "-", "*", "/", "==", "!=", ">", ">=", "<", "<=", "||", "&&"}
-        self.ref_params = {}
+        self.bops = BINARY_OPS
+        self.bound_ops = {}  # binary operator node -> its OPERATOR_TABLE entry
+        self.block_scopes = {}  # if/while node -> whether its body needs its own block
+        self.call_sites = {}  # call node -> (arg types, function node, return type) it last resolved to
 
     def run(self, program):
-        ast = parse_program(program)
+        # program is either Brewin source or an already parsed program node
+        ast = parse_program(program) if isinstance(program, str) else program
+        self.bound_ops = bind_operators(ast)
+        self.call_sites = {}
         self.__create_function_table(ast)
         self.__run_fcall(self.__get_function("main"))
 
@@ -126,49 +52,27 @@ class Interpreter(InterpreterBase):
 
     def __run_vardef(self, statement):
         name = statement.get("name")
-        if not self.env.fdef(name):
+        # names are unique across all the blocks of a function
+        if self.env.exists(name):
             super().error(ErrorType.NAME_ERROR, "variable already defined")
 
         variable_type = self.name_types(name, is_function=False)
-        #print("~test~", name, "=====", variable_type) 
-
-        if variable_type == Type.INT:
-            default_value = Value(Type.INT, 0)
-        elif variable_type == Type.STRING:
-            default_value = Value(Type.STRING, "")
-        elif variable_type == Type.BOOL:
-            default_value = Value(Type.BOOL, False)
-        elif variable_type == Type.OBJECT:
-            default_value = Value(Type.OBJECT, None) # nil?
-        else:
+        if variable_type not in (Type.INT, Type.STRING, Type.BOOL, Type.OBJECT):
             super().error(ErrorType.TYPE_ERROR, "invalid variable type")
-        
-        #print("~test~", name, "=====", default_value) 
 
-        self.env.set(name, default_value)
+        self.env.fdef(name, Value(variable_type))
 
     def __run_bvardef(self, statement):
         name = statement.get("name")
-        if not self.env.bdef(name):
+        # names are unique across all the blocks of a function
+        if self.env.exists(name):
             super().error(ErrorType.NAME_ERROR, "variable already defined")
-        
+
         variable_type = self.name_types(name, is_function=False)
-        #print("~test~", name, "=====", variable_type) 
-
-        if variable_type == Type.INT:
-            default_value = Value(Type.INT, 0)
-        elif variable_type == Type.STRING:
-            default_value = Value(Type.STRING, "")
-        elif variable_type == Type.BOOL:
-            default_value = Value(Type.BOOL, False)
-        elif variable_type == Type.OBJECT:
-            default_value = Value(Type.OBJECT, None) # nil?
-        else:
+        if variable_type not in (Type.INT, Type.STRING, Type.BOOL, Type.OBJECT):
             super().error(ErrorType.TYPE_ERROR, "invalid variable type")
-        
-        #print("~test~", name, "=====", default_value) 
 
-        self.env.set(name, default_value)
+        self.env.bdef(name, Value(variable_type))
 
     def __run_assign(self, statement): 
         name = statement.get("var")
@@ -185,34 +89,17 @@ class Interpreter(InterpreterBase):
             self.__object_assign(name, value)
             return 
 
-        if name in self.ref_params:
-            #print("YESSS: (", name, ") is in:", self.ref_params) 
-            main_env, real = self.ref_params[name]
-            #print("~confirm~ the real variable is:", real)
-            #print("~confirm~ main_env:", main_env)
-
-            exp_type = self.name_types(real, is_function=False)
-            if value.t != exp_type:
-                super().error(ErrorType.TYPE_ERROR, "types don't mach")
-
-            for i in main_env[-2]:
-                #print("~confirm~ checking block:", block.keys())
-                if real in i:
-                    #print("YAYY")
-                    i[real] = value 
-                    self.env.set(name, value)
-                    return
-            return
-                
-        if not self.env.set(name, value) and "." not in name: 
-            #print("HERE NOW") 
+        cell = self.env.get(name)
+        if cell is None:
             super().error(ErrorType.NAME_ERROR, "variable not defined")
 
         exp_type = self.name_types(name, is_function=False)
         if value.t != exp_type:
             super().error(ErrorType.TYPE_ERROR, "types don't mach")
-        
-        self.env.set(name, value)
+
+        # update the variable's cell in place: a reference parameter bound to the same
+        # cell (in a caller or callee frame) sees the new value without any lookup
+        cell.set(value)
 
     def __handle_input(self, fcall_name, args):
         """Handle inputi and inputs function calls"""
@@ -232,15 +119,7 @@ class Interpreter(InterpreterBase):
 
     def __handle_print(self, args):
         """Handle print function calls"""
-        out = ""
-
-        for arg in args:
-            c_out = self.__eval_expr(arg)
-            if c_out.t == Type.BOOL:
-                out += str(c_out.v).lower()
-            else:
-                out += str(c_out.v)
-
+        out = "".join([print_string(self.__eval_expr(arg)) for arg in args])
         super().output(out)
 
         return Value(Type.VOID, None)
@@ -257,104 +136,44 @@ class Interpreter(InterpreterBase):
         if fcall_name == "print":
             return self.__handle_print(args)
         
-        actual_values = []
-        param_types = []
-    
-        for a in args:
-            actual_values.append(self.__eval_expr(a))
-            param_types.append(self.__eval_expr(a).t)
-        #print("~confirm~ the actual_values is:",actual_values)
-        #print("~confirm~ the param_types is:",param_types)
-
-        signature = (fcall_name, tuple(param_types))
-        #print("!!", signature)
-
-        if signature not in self.funcs:
-            super().error(ErrorType.NAME_ERROR, "nothing matches with this")
-        
-        if signature in self.funcs:
-            func_def = self.funcs[signature]
-        else:
-            try:
-                func_def = self.__get_function(fcall_name, len(args))
-            except:
-                super().error(ErrorType.NAME_ERROR, "no funcs match") 
-                
-        formal_args = func_def.get("args") #[a.get("name") for a in func_def.get("args")]
-        #print("~confirm~ the formal_args is:",formal_args) 
-        
-        #actual_args = [self.__eval_expr(a) for a in args]
-        #print("~confirm~ the actual_args is:",actual_args) 
-
-        expected_return_type = self.name_types(fcall_name, is_function=True) 
-        #print("~confirm~ expected return type of:", fcall_name, "is:", expected_return_type)
-
-        #self.ref_params = {}
-        old_ref_params = self.ref_params.copy()
-        new_ref_params = {}
-
-        param_info = []
-
-        for formal, actual in zip(formal_args, actual_values):
-            #print()
-            #print("~confirm~ formal:",formal)
-            #print("~confirm~ actual:",actual)
-
-            formal_name = formal.get("name")
-            #print("~confirm~ formal_name is:", formal_name)
-            is_ref = formal.get("ref")
-            #print("~confirm~ is_ref:", is_ref)
-            #print()
-
-            if is_ref:
-                #print("its ref!")
-                #var_name = actual.get("name")
-                #print("~confirm~ var_name is:",var_name)
-
-                for f, a in zip(formal_args, args):
-                    if f is formal:
-                        actual_expr = a
-                        break 
-                
-                var_name = actual_expr.get("name")
-
-                new_ref_params[formal_name] = (self.env.env, var_name) 
-                param_info.append((formal_name, True, var_name))
-                #print("~confirm~ param_info is:", param_info)
+        # each argument is evaluated exactly once, left to right
+        actual_values = [self.__eval_expr(a) for a in args]
+        arg_types = tuple(v.t for v in actual_values)
+
+        # a call site nearly always sees the same argument types, so it keeps the
+        # overload and return type it resolved last time and only redoes the lookup
+        # when the types differ
+        site = self.call_sites.get(func_call_ast)
+        if site is None or site[0] != arg_types:
+            signature = (fcall_name, arg_types)
+            if signature not in self.funcs:
+                super().error(ErrorType.NAME_ERROR, "nothing matches with this")
+            site = (arg_types, self.funcs[signature], self.func_types[signature])
+            self.call_sites[func_call_ast] = site
+        _, func_def, expected_return_type = site
+
+        formal_args = func_def.get("args")
+
+        # a reference parameter is bound to the argument variable's own cell (evaluating
+        # a name gives the cell itself), a value parameter to a fresh copy of it
+        params = []
+        for formal, actual_expr, actual in zip(formal_args, args, actual_values):
+            if formal.get("ref"):
+                if actual_expr.elem_type != self.QUALIFIED_NAME_NODE:
+                    super().error(ErrorType.NAME_ERROR, "reference argument must be a variable")
+                params.append((formal.get("name"), actual))
             else:
-                #print("its not ref")
-                #actual_val = self.__eval_expr(actual)
-                #print("~confirm~ actual_value is:", actual_value)
-                #if actual_val.t == Type.VOID:
-                    #super().error(ErrorType.TYPE_ERROR, "no passing void")
-                param_info.append((formal_name, False, actual))
-                #print("~confirm~ param_info is:", param_info)
+                params.append((formal.get("name"), Value(actual.t, actual.v)))
 
         self.env.enter_func()
-        self.ref_params = new_ref_params
-
-        for formal_name, is_ref, value in param_info:
-            if is_ref:
-                og_env, real_var = new_ref_params[formal_name]
-                initial_value = None
-                for i in og_env[-2]:
-                    if real_var in i:
-                        initial_value = i[real_var]
-                        break
-                if initial_value is None:
-                    super().error(ErrorType.NAME_ERROR, "")
-                self.env.fdef(formal_name)
-                self.env.set(formal_name, initial_value)
-            else:
-                self.env.fdef(formal_name)
-                self.env.set(formal_name, value)
+        for formal_name, cell in params:
+            self.env.fdef(formal_name, cell)
 
         res, returned = self.__run_statements(func_def.get("statements"), expected_return_type)
 
         if not returned:
             res = self.__default_value(expected_return_type) 
 
-        self.ref_params = old_ref_params
         self.env.exit_func()
 
         return res
@@ -365,7 +184,9 @@ class Interpreter(InterpreterBase):
         if cond.t != Type.BOOL:
             super().error(ErrorType.TYPE_ERROR, "condition must be boolean")
 
-        self.env.enter_block()
+        scoped = self.__needs_scope(statement)
+        if scoped:
+            self.env.enter_block()
 
         res, ret = None, False
 
@@ -374,12 +195,14 @@ class Interpreter(InterpreterBase):
         elif statement.get("else_statements"):
             res, ret = self.__run_statements(statement.get("else_statements"), expected_return_type)
 
-        self.env.exit_block()
+        if scoped:
+            self.env.exit_block()
 
         return res, ret
 
     def __run_while(self, statement, expected_return_type):
         res, ret = Value(), False
+        scoped = self.__needs_scope(statement)
 
         while True:
             cond = self.__eval_expr(statement.get("condition"))
@@ -390,14 +213,22 @@ class Interpreter(InterpreterBase):
             if not cond.v:
                 break
 
-            self.env.enter_block()
+            if scoped:
+                self.env.enter_block()
             res, ret = self.__run_statements(statement.get("statements"), expected_return_type)
-            self.env.exit_block()
+            if scoped:
+                self.env.exit_block()
             if ret:
                 break
 
         return res, ret
 
+    def __needs_scope(self, statement):
+        scoped = self.block_scopes.get(statement)
+        if scoped is None:
+            scoped = self.block_scopes[statement] = needs_block_scope(statement)
+        return scoped
+
     def __run_return(self, statement, expected_return_type):
         expr = statement.get("expression")
         #print("~confirm~ expr is:", expr)
@@ -435,6 +266,10 @@ class Interpreter(InterpreterBase):
                 self.__run_assign(statement)
             elif kind == self.FCALL_NODE:
                 self.__run_fcall(statement)
+            elif kind == self.METHOD_CALL_NODE:
+                super().error(ErrorType.NAME_ERROR, "objects have no methods")
+            elif kind == self.INDEX_ASSIGN_NODE:
+                super().error(ErrorType.TYPE_ERROR, "lists are not supported")
             elif kind == self.IF_NODE:
                 res, ret = self.__run_if(statement, expected_return_type)
                 if ret:
@@ -449,60 +284,23 @@ class Interpreter(InterpreterBase):
 
         return res, ret
 
-    def __eval_binary_op(self, kind, vl, vr):
-        """Evaluate binary operations"""
-        tl, tr = vl.t, vr.t
-        vl_val, vr_val = vl.v, vr.v
-
-        if kind == "==":
-            if tl != tr:
-                return Value(Type.BOOL, False)
-            
-            if tl == Type.OBJECT or tl == Type.NIL:
-                return Value(Type.BOOL, vl_val is vr_val) #not just equal but same memory
-            return Value(Type.BOOL, vl_val == vr_val)
-        
-        if kind == "!=":
-            if tl != tr:
-                return Value(Type.BOOL, True)
-            
-            if tl == Type.OBJECT or tl == Type.NIL: 
-                return Value(Type.BOOL, vl_val is not vr_val)
-            return Value(Type.BOOL, vl_val != vr_val)
-
-        if tl == Type.STRING and tr == Type.STRING:
-            if kind == "+":
-                return Value(Type.STRING, vl_val + vr_val)
-
-        if tl == Type.INT and tr == Type.INT:
-            if kind == "+":
-                return Value(Type.INT, vl_val + vr_val)
-            if kind == "-":
-                return Value(Type.INT, vl_val - vr_val)
-            if kind == "*":
-                return Value(Type.INT, vl_val * vr_val)
-            if kind == "/":
-                return Value(Type.INT, vl_val // vr_val)
-            if kind == "<":
-                return Value(Type.BOOL, vl_val < vr_val)
-            if kind == "<=":
-                return Value(Type.BOOL, vl_val <= vr_val)
-            if kind == ">":
-                return Value(Type.BOOL, vl_val > vr_val)
-            if kind == ">=":
-                return Value(Type.BOOL, vl_val >= vr_val)
-
-        if tl == Type.BOOL and tr == Type.BOOL:
-            if kind == "&&":
-                return Value(Type.BOOL, vl_val and vr_val)
-            if kind == "||":
-                return Value(Type.BOOL, vl_val or vr_val)
-
-        super().error(ErrorType.TYPE_ERROR, "invalid binary operation")
+    def __eval_binary_op(self, expr, handlers):
+        """Evaluate binary operations with one lookup on the operand types"""
+        l, r = self.__eval_expr(expr.get("op1")), self.__eval_expr(expr.get("op2"))
+        impl = handlers.get((l.t, r.t))
+        if impl is None:
+            super().error(ErrorType.TYPE_ERROR, "invalid binary operation")
+        return impl(l.v, r.v)
 
     def __eval_expr(self, expr):
         kind = expr.elem_type
 
+        if kind in self.bops:  # the operator's type table was looked up at load
+            handlers = self.bound_ops.get(expr)
+            if handlers is None:  # built after the program was loaded, so not bound yet
+                handlers = self.bound_ops[expr] = OPERATOR_TABLE[kind]
+            return self.__eval_binary_op(expr, handlers)
+
         if kind == self.INT_NODE:
             return Value(Type.INT, expr.get("val"))
 
@@ -522,27 +320,25 @@ class Interpreter(InterpreterBase):
             var_name = expr.get("name")
             #print("~confirm~ var_name is:", var_name)
 
-            if var_name in self.ref_params:
-                og_env, real = self.ref_params[var_name]
-                #return og_env.get(real) 
-                for i in og_env[-2]:
-                    if real in i:
-                        return i[real]
-                super().error(ErrorType.NAME_ERROR, "")
-            
             if "." in var_name:
                 return self.__object_read(var_name)
 
-            if not self.env.exists(var_name):
+            cell = self.env.get(var_name)
+            if cell is None:
                 super().error(ErrorType.NAME_ERROR, "variable not defined")
-            return self.env.get(var_name)
+            return cell
 
         if kind == self.FCALL_NODE:
             return self.__run_fcall(expr)
 
-        if kind in self.bops:
-            l, r = self.__eval_expr(expr.get("op1")), self.__eval_expr(expr.get("op2"))
-            return self.__eval_binary_op(kind, l, r)
+        if kind == self.METHOD_CALL_NODE:
+            super().error(ErrorType.NAME_ERROR, "objects have no methods")
+
+        if kind == self.LIST_NODE or kind == self.INDEX_NODE:  # v4 syntax the parser accepts
+            super().error(ErrorType.TYPE_ERROR, "lists are not supported")
+
+        if kind == self.MAP_NODE:
+            super().error(ErrorType.TYPE_ERROR, "maps are not supported")
 
         if kind == self.NEG_NODE:
             o = self.__eval_expr(expr.get("op1"))
@@ -590,65 +386,16 @@ class Interpreter(InterpreterBase):
             #print("there is no name")
             super().error(ErrorType.TYPE_ERROR, "no name")
 
-    def __conversion(self, convert):
-        type = convert.get('to_type')
-        value = self.__eval_expr(convert.get("expr"))
-        #print(type) ###
-        #rint(value) ###
-
-        if type == "int":
-            if value.t == Type.INT:
-                return value
-            elif value.t == Type.STRING:
-                if value.v.isdigit():
-                    return Value(Type.INT, int(value.v))
-                else:
-                    super().error(ErrorType.TYPE_ERROR, "invalid parses")
-            elif value.t == Type.BOOL:
-                return Value(Type.INT, int(value.v))
-            else:
-                super().error(ErrorType.TYPE_ERROR, "no obj -> int")
-        elif type == "str":
-            if value.t == Type.STRING:
-                return value
-            elif value.t == Type.INT:
-                return Value(Type.STRING, str(value.v))
-            elif value.t == Type.BOOL:
-                if value.v:
-                    return Value(Type.STRING, "true")
-                else:
-                    return Value(Type.STRING, "false")
-            else:
-                super().error(ErrorType.TYPE_ERROR, "no obj -> str")
-        elif type == "bool":
-            if value.t == Type.BOOL:
-                return value
-            elif value.t == Type.INT:
-                if value.v != 0:
-                    return Value(Type.BOOL, True)
-                else:
-                    return Value(Type.BOOL, False)
-            elif value.t == Type.STRING:
-                if value.v != "":
-                    return Value(Type.BOOL, True)
-                else:
-                    return Value(Type.BOOL, False)
-            else:
-                super().error(ErrorType.TYPE_ERROR, "no obj -> bool")
+    def __conversion(self, expr):
+        to_type = expr.get("to_type")
+        value = self.__eval_expr(expr.get("expr"))
+        res = convert(to_type, value, self.features)
+        if res is None:
+            super().error(ErrorType.TYPE_ERROR, f"cannot convert to {to_type}")
+        return res
 
     def __default_value(self, var_type):
-        if var_type == Type.INT:
-            return Value(Type.INT, 0)
-        elif var_type == Type.STRING:
-            return Value(Type.STRING, "")
-        elif var_type == Type.BOOL:
-            return Value(Type.BOOL, False)
-        elif var_type == Type.OBJECT:
-            return Value(Type.OBJECT, None)
-        elif var_type == Type.VOID:
-            return Value(Type.VOID, None)
-        else:
-            super().error(ErrorType.TYPE_ERROR, "idk type")
+        return Value(var_type)
 
     def __object_assign(self, path, value):
         #print()
@@ -658,19 +405,9 @@ class Interpreter(InterpreterBase):
         #print("parts:", obj_section)
         #print("VALUE IS:", value.v)
 
-        curr = None
-        if obj_section[0] in self.ref_params:
-            og_env, real = self.ref_params[obj_section[0]]
-            for i in og_env[-2]:
-                if real in i:
-                    curr = i[real]
-                    break
-            if curr is None:
-                super().error(ErrorType.NAME_ERROR, "")
-        else:
-            if not self.env.exists(obj_section[0]): 
-                super().error(ErrorType.NAME_ERROR, "var not defined")
-            curr = self.env.get(obj_section[0])
+        if not self.env.exists(obj_section[0]): 
+            super().error(ErrorType.NAME_ERROR, "var not defined")
+        curr = self.env.get(obj_section[0])
 
         if curr.v is None:
             super().error(ErrorType.FAULT_ERROR, "obj is nil?")
@@ -697,7 +434,7 @@ class Interpreter(InterpreterBase):
         if self.name_types(obj_section[-1], is_function=False) != value.t:
             super().error(ErrorType.TYPE_ERROR, "types don't mach")
 
-        curr.v[obj_section[-1]] = value
+        curr.v[obj_section[-1]] = Value(value.t, value.v)  # a field gets its own cell
         
 
     def __object_read(self, path):
@@ -707,19 +444,9 @@ class Interpreter(InterpreterBase):
         obj_section = path.split(".")
         #print("parts:", obj_section)
 
-        curr = None
-        if obj_section[0] in self.ref_params:
-            og_env, real = self.ref_params[obj_section[0]]
-            for i in og_env[-2]:
-                if real in i:
-                    curr = i[real]
-                    break
-            if curr is None:
-                super().error(ErrorType.NAME_ERROR, "")
-        else:
-            if not self.env.exists(obj_section[0]):
-                super().error(ErrorType.NAME_ERROR,  "var not defined")
-            curr = self.env.get(obj_section[0])
+        if not self.env.exists(obj_section[0]):
+            super().error(ErrorType.NAME_ERROR,  "var not defined")
+        curr = self.env.get(obj_section[0])
 
         if self.name_types(obj_section[0], is_function=False) != Type.OBJECT:
             super().error(ErrorType.TYPE_ERROR, "not an object")
@@ -1,136 +1,220 @@
 from intbase import InterpreterBase, ErrorType
 from brewparse import parse_program
 from element import Element
+from brewin.core import Type, Value, Environment, ListValue, MapValue, ELEMENT_TYPES, KEY_TYPES, element_type, BINARY_OPS, OPERATOR_TABLE, SHORT_CIRCUIT, bind_operators, needs_block_scope, convert, print_string
+from brewin.builtins import Builtin, BuiltinError, MUTATING_BUILTINS, NATIVE_BUILTINS
+from brewin.features import FEATURES
+from brewin.transpile import Unsupported, compile_program
+from collections import OrderedDict
 from copy import copy, deepcopy
-import enum
-
-
-class Type(enum.Enum):
-    INT = 1
-    STRING = 2
-    BOOL = 3
-    OBJECT = 4
-    VOID = 5
-    ERROR = 6
-    FUNCTION = 7 ########
-    INTERFACE = 8 ########
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import weakref
+
+
+class Shape:
+    # the ordered (field name, field tag) pairs of an object. objects that gain the
+    # same fields in the same order share one Shape, so whether a shape satisfies an
+    # interface only has to be worked out once (see Interpreter.__conforms)
+    def __init__(self, root=None, fields=()):
+        self.root = root or self
+        self.fields = fields
+        self.transitions = {}
+        self.conforms = {}  # interface name -> bool
+
+    def add(self, name, tag):
+        key = (name, tag)
+        if key not in self.transitions:
+            self.transitions[key] = Shape(self.root, self.fields + (key,))
+        return self.transitions[key]
+
+    def retag(self, name, tag):
+        shape = self.root
+        for field, old_tag in self.fields:
+            shape = shape.add(field, tag if field == name else old_tag)
+        return shape
 
     @staticmethod
-    def get_type(var_name): #gets type from last letter of function or variable 
-        if not var_name:
-            return Type.ERROR
-        last_letter = var_name[-1]
-        if last_letter == "i":
-            return Type.INT
-        if last_letter == "s":
-            return Type.STRING
-        if last_letter == "b":
-            return Type.BOOL
-        if last_letter == "o":
-            return Type.OBJECT
-        if last_letter == "v":
-            return Type.VOID  # only for functions
-        
-        if last_letter == "f": ########
-            return Type.FUNCTION
-        if last_letter.isupper():
-            return Type.INTERFACE ########
-            
-        return Type.ERROR
-
-
-class Value:
-    def __init__(self, t, v=None):
-        if v is None:
-            self.t = t
-            self.v = self.__default_value_for_type(t)
+    def field_tag(value):
+        if value.t == Type.FUNCTION and value.v is not None:
+            return (Type.FUNCTION, len(value.v.formal_args))
+        return value.t
+
+
+class ObjectValue(dict):
+    # the field dict of a Brewin object; keeps its Shape current as fields are
+    # added or change type, which is what invalidates cached interface checks.
+    # site is the AllocationSite (the @ expression) the object was created by
+    def __init__(self, shape, site=None):
+        super().__init__()
+        self.shape = shape
+        self.site = site
+        self.oid = None  # id in the checkpoint log, once written there
+        self.dirty = True  # changed since it was last written to the checkpoint log
+        if site is not None:
+            site.allocate()
+
+    def __del__(self):
+        if self.site is not None:
+            self.site.release(len(self))
+
+    def __setitem__(self, name, value):
+        self.dirty = True
+        old = self.get(name)
+        if old is None:
+            self.shape = self.shape.add(name, Shape.field_tag(value))
+            if self.site is not None:
+                self.site.add_field()
         else:
-            self.t = t
-            self.v = v
+            tag = Shape.field_tag(value)
+            if Shape.field_tag(old) != tag:
+                self.shape = self.shape.retag(name, tag)
+        super().__setitem__(name, value)
+
+    def field_changed(self, name, old_tag):
+        # a FieldCell of this object was written to in place
+        self.dirty = True
+        tag = Shape.field_tag(self[name])
+        if tag != old_tag:
+            self.shape = self.shape.retag(name, tag)
+
+
+class FieldCell(Value):
+    # the cell of an object field that a reference parameter has been bound to. writes
+    # through the parameter go to Value.set rather than ObjectValue.__setitem__, so the
+    # cell tells its object, keeping the object's Shape and checkpoint dirty flag current.
+    # the object is held weakly so the pair doesn't form a cycle
+    __slots__ = ("owner", "name")
+
+    def __init__(self, owner, name, value):
+        super().__init__(value.t, value.v)
+        self.owner = weakref.ref(owner)
+        self.name = name
 
     def set(self, other):
-        self.t = other.t
-        self.v = other.v
-
-    def __default_value_for_type(self, t):
-        if t == Type.INT:
-            return 0
-        if t == Type.STRING:
-            return ""
-        elif t == Type.BOOL:
-            return False
-        elif t == Type.OBJECT:
-            return (
-                None  # representing Nil as an object type value with None as its value
-            )
-        elif t == Type.VOID:
-            return None
-        
-        elif t == Type.INTERFACE:
+        old_tag = Shape.field_tag(self)
+        super().set(other)
+        owner = self.owner()
+        if owner is not None and owner.get(self.name) is self:
+            owner.field_changed(self.name, old_tag)
+
+
+# approximate host cost of a Brewin object and of each of its fields
+OBJECT_BYTES = sys.getsizeof(ObjectValue(None)) + sys.getsizeof(Value(Type.OBJECT))
+FIELD_BYTES = sys.getsizeof(Value(Type.INT)) + 3 * 8  # the Value plus its dict slot
+
+
+class AllocationSite:
+    # counters for the objects created by one @ expression
+    def __init__(self, heap, line, col):
+        self.heap = heap
+        self.line = line
+        self.col = col
+        self.allocated = 0
+        self.live = 0
+        self.fields = 0
+        self.bytes = 0
+
+    def allocate(self):
+        self.allocated += 1
+        self.live += 1
+        self.bytes += OBJECT_BYTES
+        self.heap.charge(1, OBJECT_BYTES)
+
+    def add_field(self):
+        self.fields += 1
+        self.bytes += FIELD_BYTES
+        self.heap.charge(0, FIELD_BYTES)
+
+    def release(self, num_fields):
+        size = OBJECT_BYTES + num_fields * FIELD_BYTES
+        self.live -= 1
+        self.fields -= num_fields
+        self.bytes -= size
+        self.heap.charge(-1, -size)
+
+
+class Heap:
+    # live Brewin objects and their approximate size, in total and per allocation
+    # site (keyed by the @'s line and column). limit is an optional cap in bytes,
+    # checked by the interpreter
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.sites = {}
+        self.live = 0
+        self.bytes = 0
+        self.peak_bytes = 0
+
+    def site(self, line, col):
+        key = (line, col)
+        if key not in self.sites:
+            self.sites[key] = AllocationSite(self, line, col)
+        return self.sites[key]
+
+    def charge(self, objects, size):
+        self.live += objects
+        self.bytes += size
+        if self.bytes > self.peak_bytes:
+            self.peak_bytes = self.bytes
+
+    def over_limit(self):
+        return self.limit is not None and self.bytes > self.limit
+
+    def stats(self):
+        return {
+            "live_objects": self.live,
+            "bytes": self.bytes,
+            "peak_bytes": self.peak_bytes,
+            "sites": {
+                key: {
+                    "allocated": site.allocated,
+                    "live": site.live,
+                    "fields": site.fields,
+                    "bytes": site.bytes,
+                }
+                for key, site in self.sites.items()
+            },
+        }
+
+
+class Memo:
+    # LRU cache of pure function results, keyed by the function and its argument values
+    def __init__(self, size):
+        self.size = size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
             return None
-        elif t == Type.FUNCTION:
-            return None
-
-        raise Exception("invalid default value for type")
-
-
-class Environment:
-    def __init__(self):
-        self.env = [[{}]]
-
-    def enter_block(self):
-        self.env[-1].append({})
-
-    def exit_block(self):
-        self.env[-1].pop()
+        self.hits += 1
+        self.results.move_to_end(key)
+        return result
 
-    def enter_func(self):
-        self.env.append([{}])
+    def store(self, key, result):
+        self.results[key] = result
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
 
-    def exit_func(self):
-        self.env.pop()
+    def stats(self):
+        calls = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / calls if calls else 0.0,
+            "entries": len(self.results),
+            "size": self.size,
+        }
 
-    # define new variable at function scope
-    def fdef(self, varname, value):
-        top_env = self.env[-1]
-        if varname in top_env[0]:
-            return False
-        top_env[0][varname] = value
-        return True
 
-    # define new variable in top block
-    def bdef(self, varname, value):
-        self.env[-1][-1][varname] = value
-        '''
-        if self.exists(varname):
-            return False
-        top_env = self.env[-1]
-        top_env[-1][varname] = value 
-        '''
-        return True
-
-    def exists(self, varname):
-        for block in reversed(self.env[-1]):
-            if varname in block:
-                return True
-        return False
-
-    def get(self, varname):
-        top_env = self.env[-1]
-        for block in reversed(self.env[-1]):
-            if varname in block:
-                return block[varname]
-        return None
-
-    def set(self, varname, value):
-        if not self.exists(varname): #shan?
-            return False
-        top_env = self.env[-1]
-        for block in reversed(self.env[-1]):
-            if varname in block:
-                block[varname] = value
-                return True
-        return True
+PURE_TYPES = {Type.INT, Type.STRING, Type.BOOL}
 
 
 class Function: 
@@ -139,10 +223,12 @@ class Function:
     # __get_return_type finds founction type
 
     def __init__(self, func_ast):
+        self.name = func_ast.get("name")
         self.return_type = self.__get_return_type(func_ast)
         # the args in the ast is a list of qualified name nodes
         self.formal_args = {a.get("name"): a.get("ref") for a in func_ast.get("args")}
         self.statements = func_ast.get("statements")
+        self.closure_env = ()  # named functions don't capture anything
 
     def __get_return_type(self, func_ast):
         name = func_ast.get("name")
@@ -153,11 +239,22 @@ class Function:
 
 
 class FunctionValue:
-    def __init__(self, func_ast, closure_env=None):
+    # a lambda; closure_env holds one (name, cell) pair per variable the body uses
+    # from the scope it was created in, so a lambda never keeps a whole frame alive
+    __slots__ = (
+        "name", "formal_args", "statements", "return_type", "closure_env", "t", "v",
+        "node", "lid", "dirty",
+    )
+
+    def __init__(self, func_ast, closure_env=()):
+        self.node = func_ast
+        self.lid = None  # see ObjectValue.oid/dirty
+        self.dirty = True
         self.name = func_ast.get("name")
         self.formal_args = {a.get("name"): a.get("ref") for a in func_ast.get("args")}
         self.statements = func_ast.get("statements")
         self.return_type = self.__get_return_type(func_ast)
+        self.closure_env = closure_env
 
         self.t = Type.FUNCTION #i can always call these, no issue
         self.v = self
@@ -169,36 +266,449 @@ class FunctionValue:
         return Type.get_type(name)
 
 
+class CheckpointLog:
+    """
+    Append-only checkpoint file of a v4 run, one JSON record per checkpoint. A record
+    holds main's variables, the position in main to continue from, the input cursor,
+    the output printed since the previous record and only those objects and lambdas
+    that are new or changed since then, so the size of a record follows the work done
+    in between rather than the size of the heap. Finding them still walks everything
+    reachable from main's frame, so the time a checkpoint takes does grow with the
+    heap; raise checkpoint_every for programs with large heaps. Lists and maps don't
+    track changes, so every reachable one is written out again with each record.
+    """
+
+    TAGS = {Type.INT: "i", Type.STRING: "s", Type.BOOL: "b"}
+    TYPES = {"i": Type.INT, "s": Type.STRING, "b": Type.BOOL}
+
+    def __init__(self, interpreter, path):
+        self.interpreter = interpreter
+        self.path = path
+        self.next_oid = 0
+        self.next_lid = 0
+        self.next_list_id = 0
+        self.output_len = 0
+        self.function_keys = {id(f): key for key, f in interpreter.funcs.items()}
+        # lambdas are written as the index of their node in the program
+        self.lambda_nodes = []
+        self.__index_lambdas(interpreter.ast)
+        self.lambda_index = {node: i for i, node in enumerate(self.lambda_nodes)}
+        self.todo = []
+        self.seen = set()
+        self.objects = {}
+        self.lambdas = {}
+        self.lists = {}
+        self.next_mid = 0
+        self.maps = {}
+
+    def __index_lambdas(self, node):
+        if isinstance(node, list):
+            for item in node:
+                self.__index_lambdas(item)
+        elif isinstance(node, Element):
+            if node.elem_type == InterpreterBase.FUNC_NODE:
+                self.lambda_nodes.append(node)
+            for value in node.dict.values():
+                self.__index_lambdas(value)
+
+    def truncate(self):
+        open(self.path, "w").close()
+
+    def write(self, position, frame):
+        self.todo, self.seen = [], set()
+        record = {
+            "position": position,
+            "input_cursor": self.interpreter.input_cursor,
+            "output": self.interpreter.output_log[self.output_len :],
+            "frame": {name: self.encode(value) for name, value in frame.items()},
+            "objects": {},
+            "lambdas": {},
+            "lists": {},
+            "maps": {},
+        }
+        while self.todo:  # everything reachable is walked, only dirty items are written
+            item = self.todo.pop()
+            if isinstance(item, FunctionValue):
+                cells = [[name, self.encode(cell)] for name, cell in item.closure_env]
+                if item.dirty:
+                    record["lambdas"][item.lid] = [self.lambda_index[item.node], cells]
+                    item.dirty = False
+            elif isinstance(item, ListValue):
+                record["lists"][item.lid] = [self.TAGS.get(item.elem_type), list(item.items)]
+            elif isinstance(item, MapValue):
+                # as [key, value] pairs, since JSON object keys can only be strings
+                record["maps"][item.mid] = [self.TAGS.get(item.value_type), list(item.entries.items())]
+            else:
+                fields = {name: self.encode(value) for name, value in item.items()}
+                if item.dirty:
+                    where = [item.site.line, item.site.col] if item.site is not None else None
+                    record["objects"][item.oid] = [where, fields]
+                    item.dirty = False
+        self.output_len = len(self.interpreter.output_log)
+
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def encode(self, value):
+        if isinstance(value, FunctionValue):
+            return ["l", self.__visit_lambda(value)]
+        if value.t == Type.OBJECT:
+            return ["o", None if value.v is None else self.__visit_object(value.v)]
+        if value.t == Type.FUNCTION:
+            if value.v is None:
+                return ["f", None]
+            if isinstance(value.v, FunctionValue):
+                return ["vl", self.__visit_lambda(value.v)]
+            name, sig = self.function_keys[id(value.v)]
+            return ["n", name, sig]
+        if value.t == Type.LIST:
+            return ["L", None if value.v is None else self.__visit_list(value.v)]
+        if value.t == Type.MAP:
+            return ["M", None if value.v is None else self.__visit_map(value.v)]
+        if value.t == Type.STRING:
+            return ["s", str(value.v)]  # join a rope before it is written out
+        return [self.TAGS[value.t], value.v]
+
+    def __visit_object(self, obj):
+        if obj.oid is None:
+            obj.oid, self.next_oid = self.next_oid, self.next_oid + 1
+            obj.dirty = True
+        if id(obj) not in self.seen:
+            self.seen.add(id(obj))
+            self.todo.append(obj)
+        return obj.oid
+
+    def __visit_lambda(self, func):
+        if func.lid is None:
+            func.lid, self.next_lid = self.next_lid, self.next_lid + 1
+            func.dirty = True
+        if id(func) not in self.seen:
+            self.seen.add(id(func))
+            self.todo.append(func)
+        return func.lid
+
+    def __visit_list(self, items):
+        if items.lid is None:
+            items.lid, self.next_list_id = self.next_list_id, self.next_list_id + 1
+        if id(items) not in self.seen:
+            self.seen.add(id(items))
+            self.todo.append(items)
+        return items.lid
+
+    def __visit_map(self, entries):
+        if entries.mid is None:
+            entries.mid, self.next_mid = self.next_mid, self.next_mid + 1
+        if id(entries) not in self.seen:
+            self.seen.add(id(entries))
+            self.todo.append(entries)
+        return entries.mid
+
+    def restore(self):
+        """Replays the log; returns the position to continue from and main's variables"""
+        with open(self.path, encoding="utf-8") as handle:
+            records = [json.loads(line) for line in handle if line.strip()]
+        if not records:
+            raise ValueError(f"no checkpoint in {self.path}")
+
+        objects, lambdas, lists, maps, output = {}, {}, {}, {}, []
+        for record in records:
+            objects.update(record["objects"])
+            lambdas.update(record["lambdas"])
+            lists.update(record["lists"])
+            maps.update(record["maps"])
+            output += record["output"]
+        interpreter = self.interpreter
+
+        # create every object and lambda first so references between them resolve
+        for oid, (where, _) in objects.items():
+            site = interpreter.heap.site(*where) if where is not None else None
+            self.objects[int(oid)] = ObjectValue(interpreter.root_shape, site)
+        for lid, (node_index, _) in lambdas.items():
+            self.lambdas[int(lid)] = FunctionValue(self.lambda_nodes[node_index])
+        for lid, (tag, items) in lists.items():
+            self.lists[int(lid)] = ListValue(self.TYPES.get(tag), items)
+            self.lists[int(lid)].lid = int(lid)
+        for mid, (tag, entries) in maps.items():
+            self.maps[int(mid)] = MapValue(self.TYPES.get(tag), dict(entries))
+            self.maps[int(mid)].mid = int(mid)
+        for oid, (_, fields) in objects.items():
+            obj = self.objects[int(oid)]
+            for name, encoded in fields.items():
+                obj[name] = self.decode(encoded)
+            obj.oid, obj.dirty = int(oid), False
+        for lid, (_, cells) in lambdas.items():
+            func = self.lambdas[int(lid)]
+            func.closure_env = tuple((name, self.decode(cell)) for name, cell in cells)
+            func.lid, func.dirty = int(lid), False
+        self.next_oid = max(self.objects, default=-1) + 1
+        self.next_lid = max(self.lambdas, default=-1) + 1
+        self.next_list_id = max(self.lists, default=-1) + 1
+        self.next_mid = max(self.maps, default=-1) + 1
+
+        last = records[-1]
+        interpreter.output_log = output
+        interpreter.input_cursor = last["input_cursor"]
+        self.output_len = len(output)
+        frame = {name: self.decode(encoded) for name, encoded in last["frame"].items()}
+        return last["position"], frame
+
+    def decode(self, encoded):
+        tag = encoded[0]
+        if tag == "l":
+            return self.lambdas[encoded[1]]
+        if tag == "vl":
+            return Value(Type.FUNCTION, self.lambdas[encoded[1]])
+        if tag == "n":
+            return Value(Type.FUNCTION, self.interpreter.funcs[(encoded[1], encoded[2])])
+        if tag == "f":
+            return Value(Type.FUNCTION)
+        if tag == "o":
+            return Value(Type.OBJECT, None if encoded[1] is None else self.objects[encoded[1]])
+        if tag == "L":
+            return Value(Type.LIST, None if encoded[1] is None else self.lists[encoded[1]])
+        if tag == "M":
+            return Value(Type.MAP, None if encoded[1] is None else self.maps[encoded[1]])
+        return Value(self.TYPES[tag], encoded[1])
+
+
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        heap_limit=None,
+        checkpoint_path=None,
+        checkpoint_every=1000,
+        short_circuit=False,
+        hoist_loops=True,
+        memoize=False,
+        memo_size=1024,
+    ):
         super().__init__(console_output, inp)
+        # short_circuit opts into && / || that only evaluate their right operand when needed
+        self.features = FEATURES[4].with_options(short_circuit=short_circuit)
+        # with a checkpoint_path, a checkpoint is written every checkpoint_every
+        # checkpoint points (see __run_main); resume() continues from the last one
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoints = None
+        self.checkpoint_countdown = 0
+        self.heap = Heap(heap_limit)  # heap_limit: max approximate bytes of live objects
+        # memoize caches the results of pure functions (see __find_pure_functions),
+        # keeping the memo_size most recently used
+        self.memo = Memo(memo_size) if memoize else None
+        self.pure_funcs = set()
+        # set by run_async only
+        self.loop = None
+        self.input_source = None
+        self.output_sink = None
+        self.yield_every = 0
+        self.steps = 0
+        self.cancelled = False
         self.interfaces = {} # stores interface name and dict of the fields ########
         self.funcs = {}
+        self.builtins = {}  # (name, signature) -> Builtin
+        for name, params, func in NATIVE_BUILTINS:
+            self.register_builtin(name, params, func, pure=name not in MUTATING_BUILTINS)
+        self.callable_builtins = {}  # the builtins no user defined function overrides
+        self.variable_names = set()  # every variable and parameter name in the program
+        self.free_vars = {}  # lambda node -> names its body uses but doesn't declare
+        self.hoist_loops = hoist_loops  # resolve a while loop's stable names once per entry
+        self.loop_plans = {}  # while node -> nodes whose name binding is fixed while it runs
+        self.hoisted = {}  # name/assign node -> its variable's Value, call node -> True
+        self.method_sites = {}  # method call node -> receiver Shape its method was last found in
+        self.root_shape = Shape()
         self.env = Environment()
-        self.bops = {"+", "-", "*", "/", "==", "!=", ">", ">=", "<", "<=", "||", "&&"}
+        self.bops = BINARY_OPS
+        self.bound_ops = {}  # binary operator node -> its OPERATOR_TABLE entry
+        self.block_scopes = {}  # if/while node -> whether its body needs its own block
+
+    def run(self, program, backend="tree"):
+        # program is either Brewin source or an already parsed program node. with
+        # backend="python", programs brewin.transpile supports are compiled to Python
+        # and run natively; the rest (and checkpointed runs) use the tree walker
+        if backend not in ("tree", "python"):
+            raise ValueError(f"unknown backend {backend}")
+        self.__load(program)
+        if backend == "python" and self.checkpoint_path is None:
+            try:
+                main = compile_program(
+                    self,
+                    self.funcs,
+                    self.bops,
+                    short_circuit=self.features.short_circuit,
+                    builtins=self.builtins,
+                )
+            except Unsupported:
+                main = None
+            if main is not None:
+                main()
+                return
+        if self.checkpoint_path is None:
+            call_element = Element(InterpreterBase.FCALL_NODE, name="main", args=[])
+            self.__run_fcall(call_element)
+            return
 
-    def run(self, program):
-        ast = parse_program(program)
-        self.__create_function_table(ast)
-        call_element = Element(InterpreterBase.FCALL_NODE, name="main", args=[])
-        self.__run_fcall(call_element)
+        self.checkpoints = CheckpointLog(self, self.checkpoint_path)
+        self.checkpoints.truncate()
+        self.checkpoint_countdown = self.checkpoint_every
+        self.env.enter_func()
+        self.__run_main(0)
+
+    def resume(self, program, checkpoint_path=None):
+        """Continues a run of program from the last checkpoint written by an earlier run"""
+        if checkpoint_path is not None:
+            self.checkpoint_path = checkpoint_path
+        self.__load(program)
+        self.checkpoints = CheckpointLog(self, self.checkpoint_path)
+        position, frame = self.checkpoints.restore()
+        self.checkpoint_countdown = self.checkpoint_every
+        self.env.enter_func()
+        for name, value in frame.items():
+            self.env.fdef(name, value)
+        self.__run_main(position)
+
+    def __load(self, program):
+        # program is either Brewin source or an already parsed program node
+        self.ast = parse_program(program) if isinstance(program, str) else program
+        self.heap = Heap(self.heap.limit)
+        self.__create_interface_table(self.ast)
+        self.__create_function_table(self.ast)
+        if self.memo is not None:
+            self.memo = Memo(self.memo.size)
+            self.pure_funcs = self.__find_pure_functions()
+        # a builtin call only has to look for a variable of the same name if the
+        # program declares one somewhere
+        self.callable_builtins = {key: b for key, b in self.builtins.items() if key not in self.funcs}
+        self.variable_names = self.__find_variable_names(self.ast)
+        kinds = self.bops - SHORT_CIRCUIT.keys() if self.features.short_circuit else self.bops
+        self.bound_ops = bind_operators(self.ast, kinds=kinds)
+
+    def __run_main(self, start):
+        # runs main's body from statement start. before each top-level statement and
+        # each iteration of a top-level while, main's frame is all the state there is,
+        # which is what makes those the points a checkpoint can be taken (and resumed)
+        main = self.__get_function("main")
+        statements = main.statements
+        for index in range(start, len(statements)):
+            statement = statements[index]
+            if statement.elem_type == self.WHILE_NODE:
+                res = self.__run_while(main, statement, lambda: self.__checkpoint(index))
+            else:
+                self.__checkpoint(index)
+                res = self.__run_statements(main, [statement])
+            if res is not None:
+                break
+        self.env.exit_func()
+
+    def __checkpoint(self, position):
+        self.checkpoint_countdown -= 1
+        if self.checkpoint_countdown <= 0:
+            self.checkpoint_countdown = self.checkpoint_every
+            self.checkpoints.write(position, self.env.env[-1][0])
+
+    async def run_async(self, program, input_source=None, output_sink=None, yield_every=1000):
+        """
+        Runs program without blocking the event loop. input_source is an async
+        callable returning the next input line (or None), output_sink an async
+        callable taking each output line; without them the inp list / console are
+        used as in run(). The program itself runs in a worker thread (like the test
+        harness does) that hands the GIL back to the loop every yield_every statements.
+        """
+        if yield_every < 1:  # 0 would never reach a yield point, so never see a cancel
+            raise ValueError("yield_every must be at least 1")
+        # the parser is shared module state, so parse here on the loop thread
+        ast = parse_program(program) if isinstance(program, str) else program
+        self.loop = asyncio.get_running_loop()
+        self.input_source = input_source
+        self.output_sink = output_sink
+        self.yield_every = yield_every
+        self.steps = 0
+        self.cancelled = False
+        worker = asyncio.ensure_future(asyncio.to_thread(self.run, ast))
+        try:
+            await asyncio.shield(worker)
+        except asyncio.CancelledError:
+            # the worker stops at its next yield point; wait for that, so the
+            # interpreter is idle (and safe to reset) by the time this returns
+            self.cancelled = True
+            await asyncio.wait([worker])
+            worker.exception()  # the "run cancelled" error, already reported as the cancel
+            raise
+        finally:
+            # back to what run() expects: the inp list, the console and no yielding
+            self.loop = None
+            self.input_source = None
+            self.output_sink = None
+            self.yield_every = 0
+            self.cancelled = False
+
+    def get_input(self):
+        if self.input_source is None:
+            return super().get_input()
+        return self.__wait_for(self.input_source())
+
+    def output(self, v):
+        if self.output_sink is None:
+            return super().output(v)
+        self.output_log.append(v)
+        self.__wait_for(self.output_sink(v))
+
+    def __wait_for(self, coro):
+        # called from the worker thread: run coro on the loop and block until done
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def __tick(self):
+        self.steps += 1
+        if self.steps % self.yield_every == 0:
+            if self.cancelled:
+                raise Exception("run cancelled")
+            time.sleep(0)  # drops the GIL so the loop thread can run
+
+    def get_heap_stats(self):
+        gc.collect()  # objects only reachable from each other are freed by the collector
+        return self.heap.stats()
+
+    def register_builtin(self, name, params, func, pure=False):
+        """
+        Makes the Python function func callable from Brewin as name (whose suffix is the
+        return type) with parameter types params, e.g. register_builtin("hashi", "s", f).
+        pure=True lets memoized functions call it
+        """
+        self.builtins[(name, params)] = Builtin(name, params, func, pure)
+
+    def get_memo_stats(self):
+        return None if self.memo is None else self.memo.stats()
+
+    def __check_heap(self):
+        # objects in reference cycles (xo.selfo = xo) are only released once the cycle
+        # collector runs, so collect before deciding the limit really is exceeded
+        if not self.heap.over_limit():
+            return
+        gc.collect()
+        if self.heap.over_limit():
+            super().error(ErrorType.FAULT_ERROR, f"heap limit of {self.heap.limit} bytes exceeded")
 
     def __get_parameters_type_signature(self, formal_params): ########
         param_type_sig = ""
-        allowed = "biosfo"
+        allowed = "biosfolm"
         for p in formal_params:
             t = p.get("name")[-1] 
             if t.isupper():
                 t = "o"
             elif t not in allowed:
                 super().error(ErrorType.TYPE_ERROR, f"invalid type '{t}' in formal parameter")
+            elif t in "lm" and element_type(p.get("name")) == Type.ERROR:
+                super().error(ErrorType.TYPE_ERROR, "invalid element type in formal parameter")
             param_type_sig += t
 
         return param_type_sig
 
     def __get_arguments_type_signature(self, actual_args):
         arg_sig = ""
-        print("actual_args are", actual_args) ######
         for arg in actual_args:
             if arg.t == Type.INT:
                 arg_sig += "i"
@@ -210,6 +720,10 @@ class Interpreter(InterpreterBase):
                 arg_sig += "o"
             elif arg.t == Type.FUNCTION:
                 arg_sig += "f"
+            elif arg.t == Type.LIST:
+                arg_sig += "l"
+            elif arg.t == Type.MAP:
+                arg_sig += "m"
 
             elif arg.t == Type.VOID:
                 super().error(
@@ -219,6 +733,73 @@ class Interpreter(InterpreterBase):
                 raise Exception("shouldn't reach this!")
         return arg_sig
 
+    def __create_interface_table(self, ast):
+        self.interfaces = {}
+        self.root_shape = Shape()
+        for interface in ast.get("interfaces") or []:
+            name = interface.get("name")
+            if len(name) != 1 or not name.isupper():
+                super().error(ErrorType.NAME_ERROR, "interface name must be one capital letter")
+            if name in self.interfaces:
+                super().error(ErrorType.NAME_ERROR, "interface already defined")
+            fields = {}
+            for field in interface.get("fields"):
+                if field.elem_type == self.FIELD_FUNC_NODE:
+                    fields[field.get("name")] = (Type.FUNCTION, len(field.get("params")))
+                else:
+                    fields[field.get("name")] = Type.get_type(field.get("name"))
+            self.interfaces[name] = fields
+
+    def __conforms(self, obj, interface_name, seen=None):
+        """True if the (non-nil) object has every field interface_name asks for"""
+        if interface_name not in self.interfaces:
+            super().error(ErrorType.NAME_ERROR, "interface not defined")
+        fields = self.interfaces[interface_name]
+
+        shape = obj.shape
+        ok = shape.conforms.get(interface_name)
+        if ok is None:
+            have = dict(shape.fields)
+            ok = True
+            for name, want in fields.items():
+                got = have.get(name)
+                if want == Type.INTERFACE:
+                    want = Type.OBJECT
+                elif want == Type.FUNCTION and isinstance(got, tuple):
+                    got = Type.FUNCTION  # a plain f field takes a function of any arity
+                if got != want:
+                    ok = False
+                    break
+            shape.conforms[interface_name] = ok
+        if not ok:
+            return False
+
+        # a shape only says a field holds an object; nested interface fields still
+        # need their own (cached) check against the object that is there right now
+        for name, want in fields.items():
+            if want != Type.INTERFACE or obj[name].v is None:
+                continue
+            seen = seen or set()
+            key = (id(obj[name].v), name[-1])
+            if key in seen:
+                continue
+            seen.add(key)
+            if not self.__conforms(obj[name].v, name[-1], seen):
+                return False
+        return True
+
+    def __check_interface(self, name, value):
+        # name is the variable, field or parameter an object value is being stored in
+        if name[-1].isupper() and value.v is not None:
+            if not self.__conforms(value.v, name[-1]):
+                super().error(ErrorType.TYPE_ERROR, f"object does not implement interface {name[-1]}")
+
+    def __check_elements(self, name, value):
+        # name is the variable, field or parameter a list or map value is being stored in
+        if (value.t == Type.LIST or value.t == Type.MAP) and value.v is not None:
+            if not value.v.adopt(element_type(name)):
+                super().error(ErrorType.TYPE_ERROR, f"elements don't match the type of {name}")
+
     def __create_function_table(self, ast):
         self.funcs = {}
         valid_types = {"i", "s", "b", "o"}
@@ -228,19 +809,17 @@ class Interpreter(InterpreterBase):
             func_obj = Function(func)
             if func_obj.return_type == Type.ERROR:
                 super().error(ErrorType.TYPE_ERROR)
+            if func_obj.return_type in (Type.LIST, Type.MAP) and element_type(name) == Type.ERROR:
+                super().error(ErrorType.TYPE_ERROR, "invalid element type")
             type_sig = (name, param_type_sig)
             if type_sig in self.funcs:
                 super().error(ErrorType.NAME_ERROR, "function already defined")
             self.funcs[type_sig] = func_obj
     
     def __get_function(self, name, param_type_signature=""):
-        var_type = Type.get_type(name)
-        print("... :",name, "is", var_type)
-
         variable = None
         if self.env.exists(name):
             variable = self.env.get(name)
-            print("... variable is:",variable)
         if variable:
             if variable.t == Type.FUNCTION:
                 if variable.v is None:
@@ -256,13 +835,102 @@ class Interpreter(InterpreterBase):
         
         return self.funcs[(name, param_type_signature)]
     
+    def __find_pure_functions(self):
+        # a function is pure if it takes and returns only ints, strings and bools by value,
+        # never prints, reads input, creates or mutates an object or calls through a
+        # variable, and only calls pure functions and builtins. start from every candidate and drop
+        # the ones that call something impure until nothing changes (recursion is fine)
+        calls = {}
+        for func in self.funcs.values():
+            if func.return_type not in PURE_TYPES:
+                continue
+            if any(ref or Type.get_type(name) not in PURE_TYPES for name, ref in func.formal_args.items()):
+                continue
+            called = self.__get_pure_body_calls(func)
+            if called is not None:
+                calls[func] = called
+
+        by_name = {}
+        for (name, _), func in self.funcs.items():
+            by_name.setdefault(name, []).append(func)
+
+        builtin_names = {name for name, _ in self.builtins}
+        impure_builtins = {name for (name, _), b in self.builtins.items() if not b.pure}
+
+        pure = set(calls)
+        changed = True
+        while changed:
+            changed = False
+            for func in list(pure):
+                for name in calls[func]:
+                    if (
+                        (name not in by_name and name not in builtin_names)
+                        or name in impure_builtins
+                        or any(f not in pure for f in by_name.get(name, ()))
+                    ):
+                        pure.discard(func)
+                        changed = True
+                        break
+        return pure
+
+    def __find_variable_names(self, ast):
+        names = set()
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+                continue
+            if not isinstance(node, Element):
+                continue
+            kind = node.elem_type
+            if kind == self.VAR_DEF_NODE or kind == self.BVAR_DEF_NODE or kind == self.ARG_NODE:
+                names.add(node.get("name"))
+            stack.extend(node.dict.values())
+        return names
+
+    def __get_pure_body_calls(self, func):
+        # names of the functions func's body calls, or None if the body itself is impure
+        local_names = set(func.formal_args)
+        called = set()
+        stack = [func.statements]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+                continue
+            if not isinstance(node, Element):
+                continue
+            kind = node.elem_type
+            if kind == self.FUNC_NODE:  # a lambda only runs if called through a variable
+                continue
+            if kind == self.EMPTY_OBJ_NODE:
+                return None
+            if kind == "=" and "." in node.get("var"):
+                return None
+            if kind == self.METHOD_CALL_NODE:
+                return None
+            if kind == self.VAR_DEF_NODE or kind == self.BVAR_DEF_NODE:
+                local_names.add(node.get("name"))
+            if kind == self.FCALL_NODE:
+                name = node.get("name")
+                if name in ("print", "inputi", "inputs"):
+                    return None
+                called.add(name)
+            stack.extend(node.dict.values())
+        if called & local_names:  # calls through a variable
+            return None
+        return called
+
     def __run_vardef(self, statement, block_def=False):
         name = statement.get("name")
-        print(name) ########
         var_type = Type.get_type(name)
-        print(var_type) ########
         if var_type == Type.ERROR or var_type == Type.VOID:
             super().error(ErrorType.TYPE_ERROR, "invalid variable type")
+        if var_type == Type.INTERFACE and name[-1] not in self.interfaces:
+            super().error(ErrorType.NAME_ERROR, "interface not defined")
+        if (var_type == Type.LIST or var_type == Type.MAP) and element_type(name) == Type.ERROR:
+            super().error(ErrorType.TYPE_ERROR, "invalid element type")
 
         default_value = Value(var_type)
         if block_def:
@@ -282,23 +950,29 @@ class Interpreter(InterpreterBase):
         else:
             rtype = rvalue.t
 
-        if not self.env.exists(dotted_name[0]):
-            super().error(ErrorType.NAME_ERROR, "variable not defined")
+        head = self.hoisted.get(statement)  # bound once on entry to the enclosing loop
+        if head is None:
+            if not self.env.exists(dotted_name[0]):
+                super().error(ErrorType.NAME_ERROR, "variable not defined")
+            head = self.env.get(dotted_name[0])
 
-        if Type.get_type(dotted_name[-1]) != rtype:
+        target_type = Type.get_type(dotted_name[-1])
+        if target_type == Type.INTERFACE and rtype == Type.OBJECT:
+            self.__check_interface(dotted_name[-1], rvalue)
+        elif target_type != rtype:
             super().error(ErrorType.TYPE_ERROR, "type mismatch in assignment")
+        self.__check_elements(dotted_name[-1], rvalue)
 
         if len(dotted_name) == 1:
-            if isinstance(rvalue, FunctionValue):
+            if isinstance(rvalue, FunctionValue) and not isinstance(head, FieldCell):
                 self.env.set(name, rvalue) 
             else:
-                value = self.env.get(name)
-                value.set(
+                head.set(
                     rvalue
                 )  # update the value pointed to by the variable, not the mapping in the env
             return
 
-        lvalue = self.env.get(dotted_name[0])
+        lvalue = head
         if lvalue.t != Type.OBJECT:
             super().error(ErrorType.TYPE_ERROR, "cannot access member of non-object")
         if lvalue.v == None:
@@ -309,8 +983,8 @@ class Interpreter(InterpreterBase):
         for sub in suffix_name:
             if sub not in lvalue.v:
                 super().error(ErrorType.NAME_ERROR, "object member not found")
-            # every inner item must be an object, ending in an o
-            if sub[-1] != "o":
+            # every inner item must be an object, ending in an o (or an interface)
+            if sub[-1] != "o" and not sub[-1].isupper():
                 super().error(ErrorType.TYPE_ERROR, "member must be an object")
             lvalue = lvalue.v[sub]
             # every inner object must be non-nil
@@ -323,6 +997,73 @@ class Interpreter(InterpreterBase):
             lvalue.v[dotted_name[-1]] = rvalue
         else:
             lvalue.v[dotted_name[-1]] = Value(rvalue.t, rvalue.v)
+        self.__check_heap()
+
+    def __run_index_assign(self, statement):
+        rvalue = self.eval_expr(statement.get("expression"))
+        target, key = self.__get_index_target(statement)
+        raw = str(rvalue.v) if rvalue.t == Type.STRING else rvalue.v
+        if isinstance(target, ListValue):
+            if rvalue.t != target.elem_type:
+                super().error(ErrorType.TYPE_ERROR, "type mismatch in assignment")
+            target.set(key, raw)
+        else:
+            if rvalue.t != target.value_type:
+                super().error(ErrorType.TYPE_ERROR, "type mismatch in assignment")
+            target.adopt_key(Type.STRING if isinstance(key, str) else Type.INT)
+            target.entries[key] = raw
+
+    def __eval_index(self, expr):
+        target, key = self.__get_index_target(expr)
+        if isinstance(target, ListValue):
+            return Value(target.elem_type, target.get(key))
+        if key not in target.entries:
+            super().error(ErrorType.FAULT_ERROR, "key not in map")
+        return Value(target.value_type, target.entries[key])
+
+    def __get_index_target(self, node):
+        """The ListValue or MapValue node's var names, and the index (checked to be in range) or key node selects"""
+        target = self.eval_expr(node.get("var"))
+        if target.t != Type.LIST and target.t != Type.MAP:
+            super().error(ErrorType.TYPE_ERROR, "cannot index a non-list, non-map value")
+        if target.v is None:
+            super().error(ErrorType.FAULT_ERROR, "cannot index a nil list or map")
+        index = self.eval_expr(node.get("index"))
+        if target.t == Type.MAP:
+            if index.t not in KEY_TYPES:
+                super().error(ErrorType.TYPE_ERROR, "map key must be an integer or a string")
+            if not target.v.has_key_type(index.t):
+                super().error(ErrorType.TYPE_ERROR, "map key type mismatch")
+            return target.v, str(index.v) if index.t == Type.STRING else index.v
+        if index.t != Type.INT:
+            super().error(ErrorType.TYPE_ERROR, "list index must be an integer")
+        if not 0 <= index.v < len(target.v):
+            super().error(ErrorType.FAULT_ERROR, "list index out of range")
+        return target.v, index.v
+
+    def __eval_list(self, expr):
+        values = [self.eval_expr(e) for e in expr.get("elements")]
+        elem_type = values[0].t if values else None  # [] is typed by where it is stored
+        if values and (elem_type not in ELEMENT_TYPES or any(v.t != elem_type for v in values)):
+            super().error(ErrorType.TYPE_ERROR, "list elements must be ints, strings or bools of one type")
+        items = [str(v.v) if v.t == Type.STRING else v.v for v in values]
+        return Value(Type.LIST, ListValue(elem_type, items))
+
+    def __eval_map(self, expr):
+        pairs = [(self.eval_expr(k), self.eval_expr(v)) for k, v in zip(expr.get("keys"), expr.get("values"))]
+        key_type = pairs[0][0].t if pairs else None  # {} gets it from its first put
+        if any(k.t not in KEY_TYPES for k, _ in pairs):
+            super().error(ErrorType.TYPE_ERROR, "map key must be an integer or a string")
+        if any(k.t != key_type for k, _ in pairs):
+            super().error(ErrorType.TYPE_ERROR, "map keys must all be ints or all be strings")
+        value_type = pairs[0][1].t if pairs else None  # {} is typed by where it is stored
+        if pairs and (value_type not in ELEMENT_TYPES or any(v.t != value_type for _, v in pairs)):
+            super().error(ErrorType.TYPE_ERROR, "map values must be ints, strings or bools of one type")
+        entries = {
+            str(k.v) if k.t == Type.STRING else k.v: str(v.v) if v.t == Type.STRING else v.v
+            for k, v in pairs
+        }
+        return Value(Type.MAP, MapValue(value_type, entries, key_type))
 
     def __handle_input(self, fcall_name, args):
         """Handle inputi and inputs function calls"""
@@ -332,7 +1073,7 @@ class Interpreter(InterpreterBase):
         if args:
             self.__handle_print(args)
 
-        res = super().get_input()
+        res = self.get_input()
 
         return (
             Value(Type.INT, int(res))
@@ -342,7 +1083,7 @@ class Interpreter(InterpreterBase):
 
     def __handle_print(self, args):
         """Handle print function calls"""
-        out = ""
+        out = []
 
         for arg in args:
             c_out = self.eval_expr(arg)
@@ -350,12 +1091,9 @@ class Interpreter(InterpreterBase):
                 super().error(
                     ErrorType.TYPE_ERROR, "cannot pass void argument to function"
                 )
-            if c_out.t == Type.BOOL:
-                out += str(c_out.v).lower()
-            else:
-                out += str(c_out.v)
+            out.append(print_string(c_out))
 
-        super().output(out)
+        self.output("".join(out))
 
         return Value(Type.VOID, None)
 
@@ -369,41 +1107,69 @@ class Interpreter(InterpreterBase):
 
         actual_args = [self.eval_expr(a) for a in args]
         args_type_sig = self.__get_arguments_type_signature(actual_args)
-        '''func_def = self.__get_function(fcall_name, args_type_sig)'''
-        dotted_name = fcall_name.split(".")
-        if len(dotted_name) > 1: # dis is a method call if the name have more than 1 part
-            print("... this is a method call bc only 1 part")
-            object_name = ".".join(dotted_name[:-1]) #connects prev
-            method_name = dotted_name[-1] # should get the last part
-
-            obj_value = self.eval_expr(Element(self.QUALIFIED_NAME_NODE, name=object_name))
-            if obj_value.v is None:
-                super().error(ErrorType.FAULT_ERROR, "calling method on nil obj")
-
-            if method_name in obj_value.v: #methods are usually stored in dict
-                pass
-            else:
-                super().error(ErrorType.NAME_ERROR, "no method found")
-            
-            if obj_value.v[method_name].v is None:
-                super().error(ErrorType.FAULT_ERROR, "cant call nil functions")
-            else:
-                func_def = obj_value.v[method_name].v
 
-            selfo_value = obj_value 
-            is_method = True
-        else:
-            print("... this is regular function call bc only 1 part")
+        builtin = self.callable_builtins.get((fcall_name, args_type_sig))
+        if builtin is not None and (
+            fcall_name not in self.variable_names or not self.env.exists(fcall_name)
+        ):
+            return self.__run_builtin(builtin, actual_args)
+
+        func_def = None
+        if func_call_ast in self.hoisted:  # known not to be shadowed by a variable
+            func_def = self.funcs.get((fcall_name, args_type_sig))
+        if func_def is None:
             func_def = self.__get_function(fcall_name, args_type_sig)
-            if func_def is None:
-                super().error(ErrorType.FAULT_ERROR, "nil func var")
-            selfo_value = None
-            is_method = False
+        if func_def is None:
+            super().error(ErrorType.FAULT_ERROR, "nil func var")
 
-        self.env.enter_func()
+        if func_def in self.pure_funcs:
+            return self.__run_memoized(func_def, actual_args, func_call_ast)
 
-        if is_method:
-            self.env.fdef("selfo", selfo_value)
+        return self.__run_function(func_def, actual_args, None, False, args)
+
+    def __run_method_call(self, call):
+        # xo.methodf(...): methods aren't overloaded, so unlike __run_fcall this needs no
+        # type signature, and the receiver is the objref name node, found like any name
+        actual_args = [self.eval_expr(a) for a in call.get("args")]
+        for arg in actual_args:
+            if arg.t == Type.VOID:
+                super().error(ErrorType.TYPE_ERROR, "void type not allowed as parameter")
+
+        receiver = self.eval_expr(call.get("objref"))
+        if receiver.t != Type.OBJECT:
+            super().error(ErrorType.TYPE_ERROR, "cannot call a method on a non-object")
+        obj = receiver.v
+        if obj is None:
+            super().error(ErrorType.FAULT_ERROR, "calling method on nil obj")
+
+        name = call.get("name")
+        # each call site remembers the last receiver shape it checked: the same shape
+        # again has the same fields with the same types, so the method field is there
+        # and holds a function. it can still be nil (a reference parameter bound to the
+        # field can set it in place), which is one compare
+        if self.method_sites.get(call) is not obj.shape:
+            if name not in obj:
+                super().error(ErrorType.NAME_ERROR, "no method found")
+            if obj[name].t != Type.FUNCTION:
+                super().error(ErrorType.TYPE_ERROR, "attempted to call non-function member")
+            self.method_sites[call] = obj.shape
+        func_def = obj[name].v
+        if func_def is None:
+            super().error(ErrorType.FAULT_ERROR, "cant call nil functions")
+
+        return self.__run_function(func_def, actual_args, receiver, True, call.get("args"))
+
+    def __run_function(self, func_def, actual_args, selfo_value, is_method, arg_nodes=()):
+        # arg_nodes are the argument expressions, for binding reference parameters to fields
+        for i, ref in enumerate(func_def.formal_args.values()):
+            if ref and i < len(arg_nodes) and i < len(actual_args):
+                actual_args[i] = self.__bind_field_cell(arg_nodes[i], actual_args[i])
+        self.env.enter_func({"selfo": selfo_value} if is_method else None)
+
+        if func_def.closure_env:
+            func_def.dirty = True  # its cells may change during the call
+        for name, cell in func_def.closure_env:
+            self.env.fdef(name, cell)
 
         if len(func_def.formal_args) == len(actual_args):
             pass
@@ -414,16 +1180,35 @@ class Interpreter(InterpreterBase):
             ref_param = func_def.formal_args[
                 formal
             ]  # determine if it's a reference or not
+            self.__check_interface(formal, actual)
+            self.__check_elements(formal, actual)
             actual = self.__clone_for_passing(actual, ref_param)
             self.env.fdef(
                 formal, actual
             )  # no need to check types since we used types for overloading to pick a compatible function already
                 
-        res, _ = self.__run_statements(func_def, func_def.statements)
+        res = self.__run_statements(func_def, func_def.statements)
         self.env.exit_func()
 
+        if res is None:  # ran off the end of its body
+            return Value(func_def.return_type)
         return res
 
+    def __run_builtin(self, builtin, actual_args):
+        args = [str(a.v) if a.t == Type.STRING else a.v for a in actual_args]
+        try:
+            return Value(builtin.return_type, builtin.call(args))
+        except BuiltinError as e:
+            super().error(e.error_type, str(e))
+
+    def __run_memoized(self, func_def, actual_args, func_call_ast):
+        key = (func_def, tuple((a.t, str(a.v) if a.t == Type.STRING else a.v) for a in actual_args))
+        res = self.memo.lookup(key)
+        if res is None:
+            res = self.__run_function(func_def, actual_args, None, False)
+            self.memo.store(key, Value(res.t, res.v))
+        return Value(res.t, res.v)  # callers may pass the result on by reference
+
     def __clone_for_passing(self, arg, ref_param):
         if ref_param:
             return arg  # pass by reference - value is the original value from the calling function
@@ -431,59 +1216,169 @@ class Interpreter(InterpreterBase):
             arg
         )  # perform a shallow copy of the value, but still point at the original Python value
 
+    def __bind_field_cell(self, node, cell):
+        # a reference parameter bound to an object field (f(xo.yi)) gets the field's
+        # FieldCell, put in place of the field's plain cell the first time this happens
+        if node.elem_type != self.QUALIFIED_NAME_NODE or "." not in node.get("name"):
+            return cell
+        if isinstance(cell, FieldCell):
+            return cell
+        *path, field = node.get("name").split(".")
+        value = self.env.get(path[0])
+        for sub in path[1:]:
+            if value is None or value.t != Type.OBJECT or value.v is None:
+                return cell
+            value = value.v.get(sub)
+        if value is None or value.t != Type.OBJECT or value.v is None:
+            return cell
+        obj = value.v
+        if obj.get(field) is not cell:  # a later argument reassigned the field
+            return cell
+        cell = FieldCell(obj, field, cell)
+        dict.__setitem__(obj, field, cell)  # same type, so the shape and field count stay
+        return cell
+
     def __run_if(self, funcdef, statement):
         cond = self.eval_expr(statement.get("condition"))
 
         if cond.t != Type.BOOL:
             super().error(ErrorType.TYPE_ERROR, "condition must be boolean")
 
-        self.env.enter_block()
-
-        res, ret = Value(funcdef.return_type), False
+        scoped = self.__needs_scope(statement)
+        if scoped:
+            self.env.enter_block()
 
+        res = None
         if cond.v:
-            res, ret = self.__run_statements(funcdef, statement.get("statements"))
+            res = self.__run_statements(funcdef, statement.get("statements"))
         elif statement.get("else_statements"):
-            res, ret = self.__run_statements(funcdef, statement.get("else_statements"))
+            res = self.__run_statements(funcdef, statement.get("else_statements"))
 
-        self.env.exit_block()
+        if scoped:
+            self.env.exit_block()
 
-        return res, ret
+        return res
 
-    def __run_while(self, funcdef, statement):
-        res, ret = Value(funcdef.return_type), False
+    def __run_while(self, funcdef, statement, on_iteration=None):
+        res = None
+        saved = self.__hoist_loop_bindings(statement) if self.hoist_loops else {}
+        scoped = self.__needs_scope(statement)
 
-        while True:
-            cond = self.eval_expr(statement.get("condition"))
+        try:
+            while True:
+                if on_iteration is not None:
+                    on_iteration()
+                cond = self.eval_expr(statement.get("condition"))
 
-            if cond.t != Type.BOOL:
-                super().error(ErrorType.TYPE_ERROR, "condition must be boolean")
+                if cond.t != Type.BOOL:
+                    super().error(ErrorType.TYPE_ERROR, "condition must be boolean")
 
-            if not cond.v:
-                break
+                if not cond.v:
+                    break
 
-            self.env.enter_block()
-            res, ret = self.__run_statements(funcdef, statement.get("statements"))
-            self.env.exit_block()
-            if ret:
-                break
+                if scoped:
+                    self.env.enter_block()
+                res = self.__run_statements(funcdef, statement.get("statements"))
+                if scoped:
+                    self.env.exit_block()
+                if res is not None:
+                    break
+        finally:
+            # a recursive call can run this same loop in another frame; put back its bindings
+            for node, previous in saved.items():
+                if previous is None:
+                    del self.hoisted[node]
+                else:
+                    self.hoisted[node] = previous
+
+        return res
+
+    def __needs_scope(self, statement):
+        scoped = self.block_scopes.get(statement)
+        if scoped is None:
+            scoped = self.block_scopes[statement] = needs_block_scope(statement)
+        return scoped
+
+    def __hoist_loop_bindings(self, statement):
+        # resolves the loop's stable names and call targets once for this run of the loop;
+        # returns what they were bound to before (None for unbound)
+        names, calls = self.__get_loop_plan(statement)
+        saved = {}
+        for node, head in names:
+            value = self.env.get(head)
+            if value is not None and not isinstance(value, FunctionValue):
+                saved[node] = self.hoisted.get(node)
+                self.hoisted[node] = value
+        for node in calls:
+            if not self.env.exists(node.get("name")):
+                saved[node] = self.hoisted.get(node)
+                self.hoisted[node] = True
+        return saved
+
+    def __get_loop_plan(self, statement):
+        # the name, assignment and call nodes of a loop that run in the loop's frame. while
+        # the loop runs, a variable's binding only changes if it is (re)declared in the loop
+        # or assigned a function (which replaces the binding), so those names are left out
+        if statement not in self.loop_plans:
+            names, calls, declared = [], [], set()
+            self.__collect_loop_nodes(
+                [statement.get("condition"), statement.get("statements")], names, calls, declared
+            )
+            self.loop_plans[statement] = (
+                [
+                    (node, head)
+                    for node, head in names
+                    if head not in declared and Type.get_type(head) != Type.FUNCTION
+                ],
+                [node for node in calls if node.get("name") not in declared],
+            )
+        return self.loop_plans[statement]
+
+    def __collect_loop_nodes(self, node, names, calls, declared):
+        if isinstance(node, list):
+            for item in node:
+                self.__collect_loop_nodes(item, names, calls, declared)
+            return
+        if not isinstance(node, Element):
+            return
 
-        return res, ret
+        kind = node.elem_type
+        if kind == self.FUNC_NODE:  # a lambda body runs in its own frame
+            return
+        if kind == self.VAR_DEF_NODE or kind == self.BVAR_DEF_NODE:
+            declared.add(node.get("name"))
+        elif kind == self.QUALIFIED_NAME_NODE:
+            names.append((node, node.get("name").split(".")[0]))
+        elif kind == "=":
+            names.append((node, node.get("var").split(".")[0]))
+        elif kind == self.FCALL_NODE:
+            calls.append(node)
+
+        for value in node.dict.values():
+            self.__collect_loop_nodes(value, names, calls, declared)
 
     def __run_return(self, funcdef, statement):
         expr = statement.get("expression")
         if not expr:
-            return (Value(funcdef.return_type), True)
+            return Value(funcdef.return_type)
         result_val = self.eval_expr(expr)
-        if result_val.t != funcdef.return_type:
+        if funcdef.return_type == Type.INTERFACE and result_val.t == Type.OBJECT:
+            self.__check_interface(funcdef.name, result_val)
+        elif result_val.t != funcdef.return_type:
             super().error(ErrorType.TYPE_ERROR, "return type mismatch")
-        return (result_val, True)
+        self.__check_elements(funcdef.name, result_val)
+        return result_val
 
     def __run_statements(self, funcdef, statements):
-        res, ret = Value(funcdef.return_type), False
+        # like __run_if, __run_while and __run_return, returns the Value a return
+        # statement produced, or None if the statements ran to their end; the default
+        # value of a function that doesn't return is only made by __run_function
+        res = None
 
         for statement in statements:
             kind = statement.elem_type
+            if self.yield_every:
+                self.__tick()
 
             if kind == self.VAR_DEF_NODE:
                 self.__run_vardef(statement)
@@ -493,151 +1388,100 @@ class Interpreter(InterpreterBase):
                 self.__run_assign(statement)
             elif kind == self.FCALL_NODE:
                 self.__run_fcall(statement)
+            elif kind == self.METHOD_CALL_NODE:
+                self.__run_method_call(statement)
+            elif kind == self.INDEX_ASSIGN_NODE:
+                self.__run_index_assign(statement)
             elif kind == self.IF_NODE:
-                res, ret = self.__run_if(funcdef, statement)
-                if ret:
+                res = self.__run_if(funcdef, statement)
+                if res is not None:
                     break
             elif kind == self.WHILE_NODE:
-                res, ret = self.__run_while(funcdef, statement)
-                if ret:
+                res = self.__run_while(funcdef, statement)
+                if res is not None:
                     break
             elif kind == self.RETURN_NODE:
-                res, ret = self.__run_return(funcdef, statement)
+                res = self.__run_return(funcdef, statement)
                 break
 
-        return res, ret
-
-    def __eval_binary_op(self, kind, vl, vr):
-        """Evaluate binary operations"""
-        tl, tr = vl.t, vr.t
-        vl_val, vr_val = vl.v, vr.v
-
-        if kind == "==":
-            print(tl)
-            print(tr)
-            print("hereee")
-            if tl == Type.OBJECT and tr == Type.OBJECT:
-                return Value(Type.BOOL, tl == tr and vl_val is vr_val)
-            if tl == Type.FUNCTION and tr == Type.FUNCTION:
-                return Value(Type.BOOL, tl == tr and vl_val is vr_val)
-            if (tl == Type.OBJECT and tr == Type.FUNCTION) or (tl == Type.FUNCTION and tr == Type.OBJECT):
-                return Value(Type.BOOL, vl_val is vr_val)
-            return Value(Type.BOOL, tl == tr and vl_val == vr_val)
-        if kind == "!=":
-            print(tl)
-            print(tr)
-            print("here")
-            if tl == Type.OBJECT and tr == Type.OBJECT:
-                return Value(Type.BOOL, not (tl == tr and vl_val is vr_val))
-            if tl == Type.FUNCTION and tr == Type.FUNCTION:
-                return Value(Type.BOOL, not (tl == tr and vl_val is vr_val))
-            if (tl == Type.OBJECT and tr == Type.FUNCTION) or (tl == Type.FUNCTION and tr == Type.OBJECT):
-                return Value(Type.BOOL, (tl == tr and vl_val is vr_val))
-            return Value(Type.BOOL, not (tl == tr and vl_val == vr_val))
-
-        if tl == Type.STRING and tr == Type.STRING:
-            if kind == "+":
-                return Value(Type.STRING, vl_val + vr_val)
-
-        if tl == Type.INT and tr == Type.INT:
-            if kind == "+":
-                return Value(Type.INT, vl_val + vr_val)
-            if kind == "-":
-                return Value(Type.INT, vl_val - vr_val)
-            if kind == "*":
-                return Value(Type.INT, vl_val * vr_val)
-            if kind == "/":
-                return Value(Type.INT, vl_val // vr_val)
-            if kind == "<":
-                return Value(Type.BOOL, vl_val < vr_val)
-            if kind == "<=":
-                return Value(Type.BOOL, vl_val <= vr_val)
-            if kind == ">":
-                return Value(Type.BOOL, vl_val > vr_val)
-            if kind == ">=":
-                return Value(Type.BOOL, vl_val >= vr_val)
-
-        if tl == Type.BOOL and tr == Type.BOOL:
-            if kind == "&&":
-                return Value(Type.BOOL, vl_val and vr_val)
-            if kind == "||":
-                return Value(Type.BOOL, vl_val or vr_val)
-
-        super().error(ErrorType.TYPE_ERROR, "invalid binary operation")
+        return res
+
+    def __eval_binary_op(self, expr, handlers):
+        """Evaluate binary operations with one lookup on the operand types"""
+        l, r = self.eval_expr(expr.get("op1")), self.eval_expr(expr.get("op2"))
+        impl = handlers.get((l.t, r.t))
+        if impl is None:
+            super().error(ErrorType.TYPE_ERROR, "invalid binary operation")
+        return impl(l.v, r.v)
 
     def __eval_convert(self, expr):
         """Evaluate type conversion operations"""
         val = self.eval_expr(expr.get("expr"))
         to_type = expr.get("to_type")
-
-        if to_type == "int":
-            if val.t == Type.INT:
-                return val
-            elif val.t == Type.STRING:
-                try:
-                    return Value(Type.INT, int(val.v))
-                except ValueError:
-                    super().error(ErrorType.TYPE_ERROR, "cannot convert string to int")
-            elif val.t == Type.BOOL:
-                return Value(Type.INT, 1 if val.v else 0)
-            else:
-                super().error(ErrorType.TYPE_ERROR, "cannot convert object to int")
-
-        elif to_type == "str":
-            if val.t == Type.STRING:
-                return val
-            elif val.t == Type.INT:
-                return Value(Type.STRING, str(val.v))
-            elif val.t == Type.BOOL:
-                return Value(Type.STRING, str(val.v).lower())
-            else:
-                super().error(ErrorType.TYPE_ERROR, "cannot convert object to string")
-
-        elif to_type == "bool":
-            if val.t == Type.BOOL:
-                return val
-            elif val.t == Type.INT:
-                return Value(Type.BOOL, val.v != 0)
-            elif val.t == Type.STRING:
-                return Value(Type.BOOL, val.v != "")
-            else:
-                super().error(ErrorType.TYPE_ERROR, "cannot convert object to bool")
-        else:
-            super().error(ErrorType.TYPE_ERROR, "invalid conversion type")
+        res = convert(to_type, val, self.features)
+        if res is None:
+            super().error(ErrorType.TYPE_ERROR, f"cannot convert to {to_type}")
+        return res
     
+    def __eval_short_circuit(self, expr, kind):
+        """Evaluate && / || without evaluating op2 when op1 already decides the result"""
+        l = self.eval_expr(expr.get("op1"))
+        if l.t != Type.BOOL:
+            super().error(ErrorType.TYPE_ERROR, "invalid binary operation")
+        if l.v == SHORT_CIRCUIT[kind]:
+            return Value(Type.BOOL, l.v)
+        r = self.eval_expr(expr.get("op2"))
+        if r.t != Type.BOOL:
+            super().error(ErrorType.TYPE_ERROR, "invalid binary operation")
+        return Value(Type.BOOL, r.v)
+
     def __get_var_value(self, expr):
-        dotted_name = expr.get("name").split(".")
+        value = self.hoisted.get(expr)  # bound once on entry to the enclosing loop
+        name = expr.get("name")
+        if value is not None and "." not in name:
+            return value
+
+        dotted_name = name.split(".")
         #print()
         #print(dotted_name[0], "=")
         name_length = len(dotted_name)
 
-        if not self.env.exists(dotted_name[0]):
-            if name_length == 1:
-                #print("...finding function", dotted_name, "and returning as func value")
-                function_value = self.find_function_w_name(dotted_name[0])
-                #print(function_value)
-                return Value(Type.FUNCTION, function_value)
-            else:
-                super().error(ErrorType.NAME_ERROR, "variable not defined HEREE")
-        #print("... function found and set")
-        value = self.env.get(dotted_name[0])
+        if value is None:
+            if not self.env.exists(dotted_name[0]):
+                if name_length == 1:
+                    #print("...finding function", dotted_name, "and returning as func value")
+                    function_value = self.find_function_w_name(dotted_name[0])
+                    #print(function_value)
+                    return Value(Type.FUNCTION, function_value)
+                else:
+                    super().error(ErrorType.NAME_ERROR, "variable not defined HEREE")
+            #print("... function found and set")
+            value = self.env.get(dotted_name[0])
         suffix_name = dotted_name[1:]
-        if len(dotted_name) > 1 and dotted_name[0][-1] != "o":
+        if len(dotted_name) > 1 and dotted_name[0][-1] != "o" and not dotted_name[0][-1].isupper():
             super().error(ErrorType.TYPE_ERROR, "cannot dereference a non-object")
         for i, sub in enumerate(suffix_name):
             if value.v == None:  # NIL
                 super().error(ErrorType.FAULT_ERROR, "nil reference access")
             if sub not in value.v:
                 super().error(ErrorType.NAME_ERROR, "object member not found")
-            # every inner item must be an object, ending in an o
-            if i < len(suffix_name) - 1 and sub[-1] != "o":
+            # every inner item must be an object, ending in an o (or an interface)
+            if i < len(suffix_name) - 1 and sub[-1] != "o" and not sub[-1].isupper():
                 super().error(ErrorType.TYPE_ERROR, "member must be an object")
             value = value.v[sub]
         return value
 
     def eval_expr(self, expr):
         kind = expr.elem_type
-        print("... kind is", kind)
+
+        if kind in self.bops:  # the operator's type table was looked up at load
+            handlers = self.bound_ops.get(expr)
+            if handlers is None:
+                if kind in SHORT_CIRCUIT and self.features.short_circuit:
+                    return self.__eval_short_circuit(expr, kind)
+                # built after the program was loaded, so not bound yet
+                handlers = self.bound_ops[expr] = OPERATOR_TABLE[kind]
+            return self.__eval_binary_op(expr, handlers)
 
         if kind == self.INT_NODE:
             return Value(Type.INT, expr.get("val"))
@@ -652,20 +1496,30 @@ class Interpreter(InterpreterBase):
             return Value(Type.OBJECT)
 
         if kind == self.EMPTY_OBJ_NODE:
-            return Value(Type.OBJECT, {})
+            obj = ObjectValue(self.root_shape, self.heap.site(expr.get("line"), expr.get("col")))
+            self.__check_heap()
+            return Value(Type.OBJECT, obj)
 
         if kind == self.QUALIFIED_NAME_NODE:
             return self.__get_var_value(expr)
 
         if kind == self.FCALL_NODE:
             return self.__run_fcall(expr)
+
+        if kind == self.METHOD_CALL_NODE:
+            return self.__run_method_call(expr)
+
+        if kind == self.INDEX_NODE:
+            return self.__eval_index(expr)
+
+        if kind == self.LIST_NODE:
+            return self.__eval_list(expr)
+
+        if kind == self.MAP_NODE:
+            return self.__eval_map(expr)
         
         if kind == self.FUNC_NODE:
-            return FunctionValue(expr)
-
-        if kind in self.bops:
-            l, r = self.eval_expr(expr.get("op1")), self.eval_expr(expr.get("op2"))
-            return self.__eval_binary_op(kind, l, r)
+            return self.__make_closure(expr)
 
         if kind == self.NEG_NODE:
             o = self.eval_expr(expr.get("op1"))
@@ -686,6 +1540,48 @@ class Interpreter(InterpreterBase):
 
         raise Exception("should not get here!")
 
+    def __make_closure(self, func_ast):
+        # primitives are captured by value; objects and functions are references already
+        closure_env = []
+        for name in self.__get_free_vars(func_ast):
+            value = self.env.get(name)
+            if value is None:  # not a variable here, e.g. the name of a function
+                continue
+            if not isinstance(value, FunctionValue):
+                value = Value(value.t, value.v)
+            closure_env.append((name, value))
+        return FunctionValue(func_ast, tuple(closure_env))
+
+    def __get_free_vars(self, func_ast):
+        if func_ast not in self.free_vars:
+            used, declared = set(), set()
+            self.__collect_names(func_ast.get("statements"), used, declared)
+            params = {a.get("name") for a in func_ast.get("args")}
+            self.free_vars[func_ast] = tuple(sorted(used - declared - params - {"selfo"}))
+        return self.free_vars[func_ast]
+
+    def __collect_names(self, node, used, declared):
+        if isinstance(node, list):
+            for item in node:
+                self.__collect_names(item, used, declared)
+            return
+        if not isinstance(node, Element):
+            return
+
+        kind = node.elem_type
+        if kind == self.FUNC_NODE:  # nested lambda: whatever it captures we must capture too
+            used.update(self.__get_free_vars(node))
+            return
+        if kind == self.VAR_DEF_NODE:
+            declared.add(node.get("name"))
+        elif kind == self.QUALIFIED_NAME_NODE or kind == self.FCALL_NODE:
+            used.add(node.get("name").split(".")[0])
+        elif kind == "=":
+            used.add(node.get("var").split(".")[0])
+
+        for value in node.dict.values():
+            self.__collect_names(value, used, declared)
+
     def find_function_w_name(self, name):
         matches = []
         for (key, value) in self.funcs.items():
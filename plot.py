@@ -1,7 +1,5 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch
-import numpy as np
+import os
+from xml.sax.saxutils import escape
 from element import Element
 from intbase import InterpreterBase
 
@@ -13,6 +11,10 @@ def plot_ast(ast_root, figsize=None):
         ast_root: Root Element of the AST
         figsize: Tuple of (width, height) for the figure. If None, will be calculated dynamically.
     """
+    # matplotlib is only needed here, write_ast_svg works without it
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import FancyBboxPatch, ConnectionPatch
+
     # Track node positions and connections
     node_positions = {}
     connections = []
@@ -230,6 +232,160 @@ def plot_ast(ast_root, figsize=None):
     plt.tight_layout()
     plt.show()
 
+# SVG output for large trees
+SVG_LEVEL_HEIGHT = 60
+SVG_NODE_HEIGHT = 30
+SVG_GAP = 10
+SVG_CHAR_WIDTH = 7
+
+
+class Collapsed:
+    """Stands in for the part of a statement list (or deep subtree) that is not drawn"""
+
+    def __init__(self, label):
+        self.label = label
+
+
+def svg_children(node, max_children, collapse):
+    """(field label, child) pairs of node, with long lists cut down to max_children"""
+    children = []
+    if collapse:
+        return [("", Collapsed("\u2026"))] if any_element_child(node) else []
+    for field_name, field_value in node.dict.items():
+        if isinstance(field_value, Element):
+            children.append((field_name, field_value))
+        elif isinstance(field_value, list):
+            items = [(f"{field_name}[{i}]", c) for i, c in enumerate(field_value) if isinstance(c, Element)]
+            if len(items) > max_children:
+                hidden = len(items) - max_children
+                items = items[:max_children] + [(field_name, Collapsed(f"\u2026 {hidden} more"))]
+            children.extend(items)
+    return children
+
+
+def any_element_child(node):
+    for value in node.dict.values():
+        if isinstance(value, Element) or (isinstance(value, list) and any(isinstance(c, Element) for c in value)):
+            return True
+    return False
+
+
+def svg_label(node):
+    if isinstance(node, Collapsed):
+        return node.label
+    fields = [
+        f"{key}={value}"
+        for key, value in node.dict.items()
+        if not isinstance(value, (Element, list)) and value is not None
+    ]
+    return node.elem_type + (" " + " ".join(fields) if fields else "")
+
+
+def write_ast_svg(ast_root, out, max_children=25, max_depth=None):
+    """
+    Write the AST as an SVG file, for trees too big for plot_ast.
+
+    Layout is one post-order walk plus one pass to finish the x positions. Each level
+    keeps the right edge of the last box placed on it; leaves go just right of that
+    edge and each parent is centred over its children, unless that would overlap the
+    box to its left, in which case it is pushed right and the shift is recorded for
+    its subtree (and added to the right edges of the levels below). The final pass
+    applies each recorded shift to its subtree, so every node is still measured once.
+    Lists longer than max_children (e.g. long statement lists) and anything deeper
+    than max_depth are collapsed into a single placeholder node. The boxes and edges
+    are then streamed to out (a path or a text file) one line at a time.
+
+    Args:
+        ast_root: Root Element of the AST
+        out: Path or writable text file for the SVG
+        max_children: Max number of children drawn for any list field
+        max_depth: Depth below which subtrees are collapsed (None draws everything)
+    """
+    nodes = []  # (x, y, width, label), in the order they were placed
+    edges = []  # (parent index, child index, field label)
+    shifts = []  # per node: how far its descendants still have to move right
+    level_right = []  # per depth: left edge the next box on that level may start at
+
+    # each stack entry is [node, depth, children, next child, placed child indices, deepest below]
+    collapse = max_depth is not None and max_depth <= 0
+    stack = [[ast_root, 0, svg_children(ast_root, max_children, collapse), 0, [], 0]]
+    while stack:
+        entry = stack[-1]
+        node, depth, children, i, placed, deepest = entry
+        if i < len(children):
+            entry[3] += 1
+            child = children[i][1]
+            if isinstance(child, Collapsed):
+                grandchildren = []
+            else:
+                collapse = max_depth is not None and depth + 1 >= max_depth
+                grandchildren = svg_children(child, max_children, collapse)
+            stack.append([child, depth + 1, grandchildren, 0, [], depth + 1])
+            continue
+
+        stack.pop()
+        while len(level_right) <= depth:
+            level_right.append(0)
+        label = svg_label(node)
+        width = max(60, SVG_CHAR_WIDTH * len(label) + 16)
+        lowest = level_right[depth] + width / 2
+        x = (nodes[placed[0]][0] + nodes[placed[-1]][0]) / 2 if placed else lowest
+        shift = max(0, lowest - x)
+        if shift:
+            x += shift
+            for below in range(depth + 1, deepest + 1):  # the subtree is rightmost there
+                level_right[below] += shift
+        level_right[depth] = x + width / 2 + SVG_GAP
+        index = len(nodes)
+        nodes.append((x, depth * SVG_LEVEL_HEIGHT + SVG_GAP, width, label))
+        shifts.append(shift)
+        for (field_label, _), child_index in zip(children, placed):
+            edges.append((index, child_index, field_label))
+        if stack:
+            stack[-1][4].append(index)
+            stack[-1][5] = max(stack[-1][5], deepest)
+
+    # post-order puts every parent after its children, so walking backwards reaches a
+    # node's pending shift before any of its descendants
+    pending = [0] * len(nodes)
+    parents = {child: parent for parent, child, _ in edges}
+    for index in range(len(nodes) - 1, -1, -1):
+        parent = parents.get(index)
+        if parent is not None:
+            pending[index] = pending[parent] + shifts[parent]
+            x, y, width, label = nodes[index]
+            nodes[index] = (x + pending[index], y, width, label)
+
+    width = max(level_right)
+    height = len(level_right) * SVG_LEVEL_HEIGHT
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, "w", encoding="utf-8") as handle:
+            stream_svg(handle, nodes, edges, width, height)
+    else:
+        stream_svg(out, nodes, edges, width, height)
+
+
+def stream_svg(out, nodes, edges, width, height):
+    out.write(
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'font-family="monospace" font-size="11">\n'
+    )
+    for parent, child, field_label in edges:
+        px, py, _, _ = nodes[parent]
+        cx, cy, _, _ = nodes[child]
+        out.write(
+            f'<line x1="{px:.1f}" y1="{py + SVG_NODE_HEIGHT}" x2="{cx:.1f}" y2="{cy}" stroke="black">'
+            f"<title>{escape(field_label)}</title></line>\n"
+        )
+    for x, y, width, label in nodes:
+        out.write(
+            f'<rect x="{x - width / 2:.1f}" y="{y}" width="{width}" height="{SVG_NODE_HEIGHT}" '
+            f'rx="4" fill="lightblue" stroke="black"/>'
+            f'<text x="{x:.1f}" y="{y + SVG_NODE_HEIGHT / 2 + 4}" text-anchor="middle">{escape(label)}</text>\n'
+        )
+    out.write("</svg>\n")
+
+
 # Add a call to interpreterv4's Interpreter.run method
 def run_with_plotting(program_text):
     """
@@ -20,8 +20,9 @@ from harness import (
 class TestScaffold(AbstractTestScaffold):
     """Implement scaffold for Brewin' interpreter; load file, validate syntax, run testcase."""
 
-    def __init__(self, interpreter_lib):
+    def __init__(self, interpreter_lib, run_options=None):
         self.interpreter_lib = interpreter_lib
+        self.run_options = run_options or {}  # extra keyword arguments for run()
 
     def setup(self, test_case):
         srcfile = itemgetter("srcfile")(
@@ -49,7 +50,7 @@ class TestScaffold(AbstractTestScaffold):
         )
         interpreter = self.interpreter_lib.Interpreter(False, stdin, False)
         try:
-            interpreter.run(program)
+            interpreter.run(program, **self.run_options)
         except Exception as exception:  # pylint: disable=broad-except
             if expect_failure:
 
@@ -176,11 +177,21 @@ async def main():
     if not sys.argv:
         raise ValueError("Error: Missing version number argument")
     version = sys.argv[1]
-    zero_credit = len(sys.argv) > 2 and sys.argv[2] == '--zero-credit'
+    zero_credit = '--zero-credit' in sys.argv[2:]
     module_name = f"interpreterv{version}"
+    run_options = {}
+    # --backend=python runs the suite through interpreterv4's Python backend. v3
+    # programs are valid v4 programs, so the v3 suite can be run that way too; v1
+    # and v2 names carry no types, which the backend relies on
+    backends = [arg.split("=", 1)[1] for arg in sys.argv[2:] if arg.startswith("--backend=")]
+    if backends and backends[-1] != "tree":
+        if version not in ("3", "4"):
+            raise ValueError("Error: --backend is only supported for versions 3 and 4")
+        module_name = "interpreterv4"
+        run_options["backend"] = backends[-1]
     interpreter = importlib.import_module(module_name)
 
-    scaffold = TestScaffold(interpreter)
+    scaffold = TestScaffold(interpreter, run_options)
 
     match version:
         case "1":
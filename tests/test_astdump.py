@@ -0,0 +1,100 @@
+import glob
+import io
+import json
+import subprocess
+import sys
+import unittest
+
+import astdump
+from brewparse import parse_program
+
+SMALL = 'def main() { print("hi", 1); }'
+
+
+def dump(ast, fmt):
+    out = io.StringIO()
+    astdump.write_ast(ast, out, fmt)
+    return out.getvalue()
+
+
+class AstDumpTest(unittest.TestCase):
+    def test_json_round_trips(self):
+        for path in sorted(glob.glob("v4/tests/*.br")):
+            with self.subTest(path=path):
+                with open(path, encoding="utf-8") as handle:
+                    ast = parse_program(handle.read())
+                tree = json.loads(dump(ast, "json"))
+                self.assertEqual(tree["elem_type"], "program")
+                self.assertEqual(len(tree["functions"]), len(ast.get("functions")))
+
+    def test_json_of_a_small_program(self):
+        self.assertEqual(
+            json.loads(dump(parse_program(SMALL), "json")),
+            {
+                "elem_type": "program",
+                "functions": [
+                    {
+                        "elem_type": "func",
+                        "name": "main",
+                        "args": [],
+                        "statements": [
+                            {
+                                "elem_type": "fcall",
+                                "name": "print",
+                                "args": [
+                                    {"elem_type": "string", "val": "hi"},
+                                    {"elem_type": "int", "val": 1},
+                                ],
+                            }
+                        ],
+                    }
+                ],
+            },
+        )
+
+    def test_sexpr_of_a_small_program(self):
+        self.assertEqual(
+            dump(parse_program(SMALL), "sexpr"),
+            '(program :functions ((func :name "main" :args () :statements '
+            '((fcall :name "print" :args ((string :val "hi") (int :val 1)))))))\n',
+        )
+
+    def test_dot_of_a_small_program(self):
+        self.assertEqual(
+            dump(parse_program(SMALL), "dot"),
+            "digraph ast {\n"
+            "  node [shape=box];\n"
+            '  n0 [label="program"];\n'
+            '  n0 -> n1 [label="functions[0]"];\n'
+            '  n1 [label="func\\nname=main"];\n'
+            '  n1 -> n2 [label="statements[0]"];\n'
+            '  n2 [label="fcall\\nname=print"];\n'
+            '  n2 -> n3 [label="args[0]"];\n'
+            '  n2 -> n4 [label="args[1]"];\n'
+            '  n4 [label="int\\nval=1"];\n'
+            '  n3 [label="string\\nval=hi"];\n'
+            "}\n",
+        )
+
+    def test_dot_labels_keep_non_ascii_text(self):
+        dot = dump(parse_program('def main() { print("héllo"); }'), "dot")
+        self.assertIn('[label="string\\nval=héllo"]', dot)
+
+    def test_export_does_not_import_plotting_libraries(self):
+        script = (
+            "import io, sys, astdump\n"
+            "from brewparse import parse_program\n"
+            f"ast = parse_program({SMALL!r})\n"
+            "for fmt in astdump.FORMATS:\n"
+            "    astdump.write_ast(ast, io.StringIO(), fmt)\n"
+            "print(sorted(m for m in ('matplotlib', 'numpy') if m in sys.modules))\n"
+        )
+        # a fresh interpreter, since other tests in this run may have imported them
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import glob
+import os
+import tempfile
+import unittest
+
+import astpack
+from brewparse import parse_program
+
+
+class PackRoundTripTest(unittest.TestCase):
+    def test_v4_programs_round_trip(self):
+        for path in sorted(glob.glob("v4/tests/*.br") + glob.glob("v4/fails/*.br")):
+            with self.subTest(path=path):
+                with open(path, encoding="utf-8") as handle:
+                    ast = parse_program(handle.read())
+                self.assertEqual(str(astpack.loads(astpack.dumps(ast))), str(ast))
+
+    def test_load_maps_and_closes(self):
+        ast = parse_program("def main() { var xl; xl = [1, [2, 3], []]; print(xl); }")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "prog.brast")
+            astpack.dump(ast, path)
+            with astpack.open_packed(path) as program:
+                self.assertEqual(str(program.root_element()), str(ast))
+            self.assertIsNone(program.mapping)
+
+    def test_load_rejects_empty_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "empty.brast")
+            open(path, "wb").close()
+            with self.assertRaises(ValueError):
+                astpack.load(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+
+import interpreterv4
+
+ECHO = """
+def main() {
+  var ni;
+  var si;
+  ni = inputi("how many?");
+  si = 0;
+  while (ni > 0) {
+    si = si + inputi();
+    ni = ni - 1;
+  }
+  print("sum ", si);
+}
+"""
+
+FOREVER = """
+def main() {
+  var ki;
+  print("started");
+  while (true) {
+    ki = ki + 1;
+  }
+}
+"""
+
+
+class RunAsyncTest(unittest.IsolatedAsyncioTestCase):
+    async def test_input_and_output_are_forwarded(self):
+        lines = iter(["3", "10", "20", "30"])
+        printed = []
+
+        async def source():
+            await asyncio.sleep(0)
+            return next(lines)
+
+        async def sink(line):
+            printed.append(line)
+
+        interpreter = interpreterv4.Interpreter(False)
+        await interpreter.run_async(ECHO, source, sink, yield_every=10)
+        self.assertEqual(printed, ["how many?", "sum 60"])
+        self.assertEqual(interpreter.get_output(), printed)
+
+    async def test_cancel_stops_a_running_loop(self):
+        started = asyncio.Event()
+
+        async def sink(line):
+            started.set()
+
+        interpreter = interpreterv4.Interpreter(False)
+        task = asyncio.create_task(interpreter.run_async(FOREVER, output_sink=sink, yield_every=10))
+        await asyncio.wait_for(started.wait(), 5)
+        await asyncio.sleep(0.01)  # let the loop get going
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        steps = interpreter.steps  # the worker has already stopped
+        await asyncio.sleep(0.05)
+        self.assertGreater(steps, 0)
+        self.assertEqual(interpreter.steps, steps)
+
+    async def test_run_after_run_async_uses_inp_and_console(self):
+        async def source():
+            return "1"
+
+        async def sink(line):
+            pass
+
+        interpreter = interpreterv4.Interpreter(False, inp=["1", "5"])
+        await interpreter.run_async(ECHO, source, sink, yield_every=10)
+        self.assertIsNone(interpreter.input_source)
+        self.assertIsNone(interpreter.output_sink)
+        self.assertEqual(interpreter.yield_every, 0)
+        self.assertFalse(interpreter.cancelled)
+
+        interpreter.reset()
+        interpreter.run(ECHO)
+        self.assertEqual(interpreter.get_output(), ["how many?", "sum 5"])
+
+    async def test_run_after_cancel(self):
+        started = asyncio.Event()
+
+        async def sink(line):
+            started.set()
+
+        interpreter = interpreterv4.Interpreter(False)
+        task = asyncio.create_task(interpreter.run_async(FOREVER, output_sink=sink, yield_every=10))
+        await asyncio.wait_for(started.wait(), 5)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        interpreter.reset()
+        interpreter.run('def main() { print("done"); }')
+        self.assertEqual(interpreter.get_output(), ["done"])
+
+    async def test_yield_every_must_be_positive(self):
+        interpreter = interpreterv4.Interpreter(False)
+        for yield_every in (0, -1):
+            with self.assertRaises(ValueError):
+                await interpreter.run_async(FOREVER, yield_every=yield_every)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+import interpreterv4
+
+PROGRAM = """
+def incv(&ni) {
+  ni = ni + 1;
+}
+
+def main() {
+  var po;
+  var ki;
+  var numsil;
+  var countsim;
+  var addf;
+
+  po = @;
+  po.xi = 0;
+  ki = 0;
+  numsil = [];
+  countsim = {};
+  addf = lambdai(ai) { return ai + ki; };
+  while (ki < 10) {
+    incv(po.xi);
+    appendv(numsil, ki);
+    putv(countsim, "k", ki);
+    ki = ki + 1;
+  }
+  print(po.xi, " ", numsil, " ", geti(countsim, "k", 0), " ", addf(1));
+}
+"""
+
+
+class ResumeTest(unittest.TestCase):
+    def test_resume_from_every_checkpoint_matches_full_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run.log")
+            full = interpreterv4.Interpreter(False, checkpoint_path=path, checkpoint_every=1)
+            full.run(PROGRAM)
+            with open(path, encoding="utf-8") as handle:
+                records = handle.readlines()
+            self.assertGreater(len(records), 10)
+
+            for count in range(1, len(records) + 1):
+                with self.subTest(records=count):
+                    with open(path, "w", encoding="utf-8") as handle:
+                        handle.writelines(records[:count])
+                    resumed = interpreterv4.Interpreter(False, checkpoint_path=path, checkpoint_every=1)
+                    resumed.resume(PROGRAM)
+                    self.assertEqual(resumed.get_output(), full.get_output())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+import interpreterv4
+from intbase import ErrorType
+
+CYCLES = """
+def main() {
+  var ki;
+  var xo;
+  ki = 0;
+  while (ki < 200) {
+    xo = @;
+    xo.selfo = xo;
+    ki = ki + 1;
+  }
+  print("done");
+}
+"""
+
+GROWING = """
+def main() {
+  var heado;
+  var xo;
+  var ki;
+  ki = 0;
+  while (ki < 200) {
+    xo = @;
+    xo.nexto = heado;
+    heado = xo;
+    ki = ki + 1;
+  }
+  print("done");
+}
+"""
+
+SAME_LINE = """
+def main() {
+  var ao;
+  var bo;
+  var ki;
+  ki = 0;
+  while (ki < 3) {
+    ao = @; bo = @;
+    bo.vi = ki;
+    ki = ki + 1;
+  }
+  print(bo.vi);
+}
+"""
+
+
+def run(program, **options):
+    interpreter = interpreterv4.Interpreter(False, **options)
+    interpreter.run(program)
+    return interpreter
+
+
+class HeapTest(unittest.TestCase):
+    def test_cycles_are_collected_before_the_limit_fails(self):
+        interpreter = run(CYCLES, heap_limit=50 * interpreterv4.OBJECT_BYTES)
+        self.assertEqual(interpreter.get_output(), ["done"])
+        self.assertLessEqual(interpreter.get_heap_stats()["live_objects"], 1)
+
+    def test_live_objects_over_the_limit_fail(self):
+        interpreter = interpreterv4.Interpreter(False, heap_limit=50 * interpreterv4.OBJECT_BYTES)
+        with self.assertRaises(Exception):
+            interpreter.run(GROWING)
+        self.assertEqual(interpreter.get_error_type_and_line()[0], ErrorType.FAULT_ERROR)
+        self.assertEqual(interpreter.get_output(), [])
+
+    def test_sites_on_one_line_are_counted_apart(self):
+        interpreter = run(SAME_LINE)
+        self.assertEqual(interpreter.get_output(), ["2"])
+        stats = interpreter.get_heap_stats()
+        sites = sorted(stats["sites"].items())
+        self.assertEqual(len(sites), 2)
+        (first_key, first), (second_key, second) = sites
+        self.assertEqual(first_key[0], second_key[0])  # same line, different columns
+        self.assertEqual([first["allocated"], second["allocated"]], [3, 3])
+        self.assertEqual(stats["live_objects"], 0)  # main has returned
+        self.assertEqual(stats["bytes"], 0)
+        self.assertGreaterEqual(stats["peak_bytes"], 2 * interpreterv4.OBJECT_BYTES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+import interpreterv4
+
+IMPURE = """
+def loudi(xi) {
+  print("called ", xi);
+  return xi;
+}
+
+def readi(xi) {
+  return inputi() + xi;
+}
+
+def bumpi(co) {
+  co.ni = co.ni + 1;
+  return co.ni;
+}
+
+def viaVari(xi) {
+  var ff;
+  ff = loudi;
+  return ff(xi);
+}
+
+def main() {
+  var co;
+  co = @;
+  co.ni = 0;
+  print(loudi(1) + loudi(1));
+  print(readi(0), " ", readi(0));
+  print(bumpi(co), " ", bumpi(co));
+  print(viaVari(2) + viaVari(2));
+}
+"""
+
+FIB = """
+def fibi(ni) {
+  if (ni < 2) {
+    return ni;
+  }
+  return fibi(ni - 1) + fibi(ni - 2);
+}
+
+def main() {
+  print(fibi(10));
+  print(fibi(10));
+}
+"""
+
+SQUARES = """
+def sqi(xi) {
+  return xi * xi;
+}
+
+def main() {
+  print(sqi(1));
+  print(sqi(2));
+  print(sqi(3));
+  print(sqi(3));
+  print(sqi(1));
+}
+"""
+
+
+def run(program, **options):
+    interpreter = interpreterv4.Interpreter(False, memoize=True, **options)
+    interpreter.run(program)
+    return interpreter
+
+
+class MemoTest(unittest.TestCase):
+    def test_side_effects_repeat(self):
+        interpreter = run(IMPURE, inp=["10", "20"])
+        self.assertEqual(
+            interpreter.get_output(),
+            ["called 1", "called 1", "2", "10 20", "1 2", "called 2", "called 2", "4"],
+        )
+        self.assertEqual(interpreter.get_memo_stats()["entries"], 0)
+
+    def test_recursive_calls_hit_the_memo(self):
+        interpreter = run(FIB)
+        self.assertEqual(interpreter.get_output(), ["55", "55"])
+        stats = interpreter.get_memo_stats()
+        # fibi(0) .. fibi(10) are each computed once; fibi(ni - 2) is a hit for ni = 3 .. 10,
+        # as is the second fibi(10) from main
+        self.assertEqual(stats["misses"], 11)
+        self.assertEqual(stats["hits"], 9)
+        self.assertEqual(stats["entries"], 11)
+        self.assertAlmostEqual(stats["hit_rate"], 9 / 20)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        interpreter = run(SQUARES, memo_size=2)
+        self.assertEqual(interpreter.get_output(), ["1", "4", "9", "9", "1"])
+        stats = interpreter.get_memo_stats()
+        self.assertEqual(stats["hits"], 1)  # sqi(3); sqi(1) was evicted by sqi(3)
+        self.assertEqual(stats["misses"], 4)
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["size"], 2)
+
+    def test_stats_are_none_without_memoize(self):
+        interpreter = interpreterv4.Interpreter(False)
+        interpreter.run(SQUARES)
+        self.assertIsNone(interpreter.get_memo_stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import glob
+import io
+import re
+import unittest
+
+from brewparse import parse_program
+from element import Element
+from plot import write_ast_svg
+
+RECT = re.compile(r'<rect x="([-\d.]+)" y="([\d.]+)" width="([\d.]+)"')
+
+
+def boxes_by_level(svg):
+    levels = {}
+    for x, y, width in RECT.findall(svg):
+        levels.setdefault(float(y), []).append((float(x), float(x) + float(width)))
+    return levels
+
+
+class SvgLayoutTest(unittest.TestCase):
+    def assert_no_overlap(self, ast, **options):
+        out = io.StringIO()
+        write_ast_svg(ast, out, **options)
+        for y, boxes in boxes_by_level(out.getvalue()).items():
+            boxes.sort()
+            self.assertGreaterEqual(boxes[0][0], 0, f"box off the left edge on level {y}")
+            for (_, right), (left, _) in zip(boxes, boxes[1:]):
+                self.assertLessEqual(right, left, f"boxes overlap on level {y}")
+
+    def test_wide_parent_over_narrow_children(self):
+        long_name = "a_parent_label_much_wider_than_its_children"
+        ast = Element(
+            "program",
+            functions=[
+                Element(long_name, args=[Element("x"), Element("y")]),
+                Element(long_name, args=[Element("x")]),
+                Element("short"),
+            ],
+        )
+        self.assert_no_overlap(ast)
+
+    def test_v4_programs(self):
+        for path in sorted(glob.glob("v4/tests/*.br")):
+            with self.subTest(path=path):
+                with open(path, encoding="utf-8") as handle:
+                    ast = parse_program(handle.read())
+                self.assert_no_overlap(ast)
+                self.assert_no_overlap(ast, max_children=2, max_depth=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+import interpreterv4
+from intbase import ErrorType
+
+CALLS = """
+def main() {
+  print(hashi("abc"));
+  print(pads("7", 3));
+  print(evenb(4), " ", evenb(3));
+  notev("done");
+}
+"""
+
+WRONG_ARGS = """
+def main() {
+  print(hashi(5));
+}
+"""
+
+USER_FUNCTION = """
+def hashi(ss) {
+  return 7;
+}
+
+def main() {
+  print(hashi("abc"));
+}
+"""
+
+VARIABLE = """
+def main() {
+  var hashi;
+  hashi = 5;
+  print(hashi("abc"));
+}
+"""
+
+VARIABLE_OUT_OF_SCOPE = """
+def fi() {
+  var hashi;
+  hashi = 1;
+  return hashi;
+}
+
+def main() {
+  print(fi());
+  print(hashi("abc"));
+}
+"""
+
+
+def make_interpreter(notes=None):
+    interpreter = interpreterv4.Interpreter(False)
+    interpreter.register_builtin("hashi", "s", len)
+    interpreter.register_builtin("pads", "si", lambda s, width: s.rjust(width, "0"))
+    interpreter.register_builtin("evenb", "i", lambda n: n % 2 == 0, pure=True)
+    interpreter.register_builtin("notev", "s", lambda s: notes.append(s))
+    return interpreter
+
+
+class RegisterBuiltinTest(unittest.TestCase):
+    def run_error(self, interpreter, program):
+        with self.assertRaises(Exception):
+            interpreter.run(program)
+        return interpreter.get_error_type_and_line()[0]
+
+    def test_registered_functions_are_callable(self):
+        notes = []
+        interpreter = make_interpreter(notes)
+        interpreter.run(CALLS)
+        self.assertEqual(interpreter.get_output(), ["3", "007", "true false"])
+        self.assertEqual(notes, ["done"])
+
+    def test_name_suffix_and_parameters_are_checked(self):
+        interpreter = interpreterv4.Interpreter(False)
+        for name, params in (("hashx", "s"), ("hasho", "s"), ("hashi", "q")):
+            with self.subTest(name=name, params=params):
+                with self.assertRaises(ValueError):
+                    interpreter.register_builtin(name, params, len)
+
+    def test_result_must_match_the_suffix(self):
+        interpreter = interpreterv4.Interpreter(False)
+        interpreter.register_builtin("hashi", "s", str)  # returns a str, not an int
+        with self.assertRaises(TypeError):
+            interpreter.run('def main() { print(hashi("abc")); }')
+
+    def test_unregistered_signature_is_a_name_error(self):
+        self.assertEqual(self.run_error(make_interpreter(), WRONG_ARGS), ErrorType.NAME_ERROR)
+
+    def test_user_function_takes_precedence(self):
+        interpreter = make_interpreter()
+        interpreter.run(USER_FUNCTION)
+        self.assertEqual(interpreter.get_output(), ["7"])
+
+    def test_variable_takes_precedence(self):
+        self.assertEqual(self.run_error(make_interpreter(), VARIABLE), ErrorType.TYPE_ERROR)
+
+    def test_variable_out_of_scope_does_not_hide_the_builtin(self):
+        interpreter = make_interpreter()
+        interpreter.run(VARIABLE_OUT_OF_SCOPE)
+        self.assertEqual(interpreter.get_output(), ["1", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
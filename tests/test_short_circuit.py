@@ -0,0 +1,81 @@
+import unittest
+
+import interpreterv4
+from intbase import ErrorType
+
+NIL_GUARD = """
+def main() {
+  var xo;
+  xo = nil;
+  if (xo != nil && xo.vi > 0) {
+    print("positive");
+  } else {
+    print("guarded");
+  }
+}
+"""
+
+SKIPPED_OPERAND = """
+def noisyb() {
+  print("evaluated");
+  return true;
+}
+
+def main() {
+  print(true || 5);
+  print(false && 5);
+  print(true || noisyb());
+  print(false && noisyb());
+  print(false || noisyb());
+}
+"""
+
+BAD_RIGHT_OPERAND = """
+def main() {
+  print(false || 5);
+}
+"""
+
+BACKENDS = ("tree", "python")
+
+
+def run(program, backend):
+    interpreter = interpreterv4.Interpreter(False, short_circuit=True)
+    interpreter.run(program, backend=backend)
+    return interpreter
+
+
+class ShortCircuitTest(unittest.TestCase):
+    def test_nil_check_guards_the_field_access(self):
+        # objects are not compiled, so the python backend falls back to the tree walker here
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                interpreter = run(NIL_GUARD, backend)
+                self.assertEqual(interpreter.get_output(), ["guarded"])
+
+    def test_right_operand_is_skipped_when_left_decides(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                interpreter = run(SKIPPED_OPERAND, backend)
+                self.assertEqual(
+                    interpreter.get_output(),
+                    ["true", "false", "true", "false", "evaluated", "true"],
+                )
+
+    def test_evaluated_right_operand_is_still_type_checked(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                interpreter = interpreterv4.Interpreter(False, short_circuit=True)
+                with self.assertRaises(Exception):
+                    interpreter.run(BAD_RIGHT_OPERAND, backend=backend)
+                self.assertEqual(interpreter.get_error_type_and_line()[0], ErrorType.TYPE_ERROR)
+
+    def test_without_the_option_both_operands_are_evaluated(self):
+        interpreter = interpreterv4.Interpreter(False)
+        with self.assertRaises(Exception):
+            interpreter.run(NIL_GUARD)
+        self.assertEqual(interpreter.get_error_type_and_line()[0], ErrorType.FAULT_ERROR)
+
+
+if __name__ == "__main__":
+    unittest.main()